@@ -0,0 +1,113 @@
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+
+from FeatureEngineering.feature_functions import fighter_ids
+
+class FighterAppearances:
+    """
+    Long format view of a bout table, one row per fighter per bout.
+    Row 2*i is the red fighter of bout i and row 2*i+1 the blue fighter, so any per fighter feature
+    can be computed as a grouped vector operation over fighter_id and reshaped back to red/blue.
+
+    table columns:
+        bout_idx: position of the bout in the (date sorted) bout table
+        corner: 0 red, 1 blue
+        fighter_id / opponent_id: dense integer fighter ids
+        opponent_row: row of the opponent's appearance in the same bout
+        career_bout: number of earlier appearances of the fighter in this table, 0 on their first
+    With a FighterState the fighter ids come from (and extend) the state's ids, otherwise from the
+    FighterRegistry when given, else they are numbered by first appearance in bouts.
+    """
+
+    def __init__(self, bouts, state=None, registry=None):
+        if state is not None:
+            red_ids, blue_ids, n_fighters = state.fighter_ids(bouts)
+        elif registry is not None:
+            red_ids, blue_ids, n_fighters = registry.fighter_ids(bouts)
+        else:
+            red_ids, blue_ids, n_fighters = fighter_ids(bouts)
+        self.n_bouts = bouts.shape[0]
+        self.n_fighters = n_fighters
+        self.red_ids = red_ids
+        self.blue_ids = blue_ids
+
+        fighter = np.column_stack([red_ids, blue_ids]).ravel()
+        opponent = np.column_stack([blue_ids, red_ids]).ravel()
+        rows = np.arange(2 * self.n_bouts)
+
+        self.table = pd.DataFrame({
+            'bout_idx': rows // 2,
+            'corner': rows % 2,
+            'fighter_id': fighter,
+            'opponent_id': opponent,
+            'opponent_row': rows ^ 1,
+        })
+        self.table['career_bout'] = self.groupby(rows).cumcount().to_numpy()
+
+    @property
+    def fighter(self):
+        return self.table['fighter_id'].to_numpy()
+
+    @property
+    def debut(self):
+        return self.table['career_bout'].to_numpy() == 0
+
+    def ids(self):
+        """(red_ids, blue_ids, n_fighters) per bout, same as fighter_ids on the bout table"""
+        return self.red_ids, self.blue_ids, self.n_fighters
+
+    def groupby(self, values):
+        """Group appearance values by fighter, keeps chronological order within each fighter"""
+        return pd.DataFrame(values).groupby(self.fighter, sort=False)
+
+    def stack(self, bouts, col):
+        """{col}_red/{col}_blue columns of the bout table to one value per appearance"""
+        return np.column_stack([bouts[f'{col}_red'].to_numpy(dtype=float), bouts[f'{col}_blue'].to_numpy(dtype=float)]).ravel()
+
+    def repeat(self, bouts, col):
+        """Bout level column repeated for both corners"""
+        return np.repeat(bouts[col].to_numpy(dtype=float), 2)
+
+    def unstack(self, values):
+        """Appearance values back to the wide layout, returns (red, blue)"""
+        values = np.asarray(values).reshape(self.n_bouts, 2)
+        return values[:, 0], values[:, 1]
+
+    def opponent(self, values):
+        """Value of the opponent's appearance in the same bout"""
+        return np.asarray(values)[self.table['opponent_row'].to_numpy()]
+
+    def prefight_totals(self, values, base=None):
+        """
+        Sum of each fighter's earlier appearances for every column of values.
+        A NaN poisons every later total like np.sum does, first appearance totals are NaN.
+        base, (n_fighters, columns), carries totals in from bouts before this table: it is added to every
+        total (first appearances get base itself) and is updated in place to the totals after the table.
+        """
+        values = pd.DataFrame(values)
+        nan_seen = self.groupby(values.isna()).cumsum() > 0
+        totals = self.groupby(values.fillna(0)).cumsum().mask(nan_seen)
+        prefight = self.groupby(totals).shift(1).to_numpy()
+        if base is None:
+            return prefight
+
+        base_rows = base[self.fighter]
+        prefight = np.where(self.debut[:, None], base_rows, prefight + base_rows)
+        last_row = pd.Series(np.arange(len(values))).groupby(self.fighter).max()
+        base[last_row.index.to_numpy()] += totals.to_numpy()[last_row.to_numpy()]
+        return prefight
+
+    def prefight_counts(self, flags):
+        """Number of each fighter's earlier appearances where flags is set, 0 on debut"""
+        flags = pd.DataFrame(np.asarray(flags, dtype=np.int64))
+        return (self.groupby(flags).cumsum() - flags).to_numpy()
+
+    def previous(self, values):
+        """Value at each fighter's previous appearance, NaN on debut"""
+        return self.groupby(values).shift(1).to_numpy()
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+# day number used for dates that can not be parsed, same bits as NaT so views as datetime64 stay missing
+NO_DAY = np.iinfo(np.int64).min
+
+# date string -> day number, shared by every call so each distinct string is only ever parsed once
+_day_cache = {}
+
+# tried in order for strings the ISO parser can not read, "April 22, 2004" and "Apr 22, 2004"
+DATE_FORMATS = ["ISO8601", "%B %d, %Y", "%b %d, %Y"]
+
+def parse_unique_dates(values):
+    """Parse distinct date values to day numbers, NO_DAY when no format matches ('--' dob etc.)"""
+    values = pd.Series(values, dtype=object)
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    for fmt in DATE_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(values[missing].astype(str).str.strip(), format=fmt, errors='coerce')
+    return parsed.to_numpy('datetime64[D]').astype(np.int64)
+
+def day_numbers(col):
+    """
+    int64 days since 1970-01-01 for a column of date strings (or datetimes), NO_DAY when missing.
+    Each unique value is parsed once and cached across calls, so a fighter's DOB repeated on every
+    one of their bouts costs a single parse.
+    """
+    codes, uniques = pd.factorize(pd.Series(col), use_na_sentinel=True)
+    uniques = list(uniques)
+    uncached = [u for u in uniques if u not in _day_cache]
+    if uncached:
+        _day_cache.update(zip(uncached, parse_unique_dates(uncached).tolist()))
+
+    lookup = np.array([_day_cache[u] for u in uniques] + [NO_DAY], dtype=np.int64)
+    return lookup[codes] # NaN has code -1, the trailing NO_DAY
+
+def to_datetime(days):
+    """day numbers to datetime64, NO_DAY -> NaT"""
+    return np.asarray(days, dtype=np.int64).view('datetime64[D]').astype('datetime64[ns]')
+
+def day_years(days):
+    """calendar year of each day number, NaN when missing"""
+    days = np.asarray(days, dtype=np.int64)
+    years = days.view('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+    return np.where(days == NO_DAY, np.nan, years)
+
+def day_months(days):
+    """running month index (year * 12 + month) of each day number, NaN when missing"""
+    days = np.asarray(days, dtype=np.int64)
+    months = days.view('datetime64[D]').astype('datetime64[M]').astype(np.int64) + 1970 * 12 + 1
+    return np.where(days == NO_DAY, np.nan, months)
+
+def day_floats(days):
+    """day numbers as float with NaN when missing, for day gaps"""
+    days = np.asarray(days, dtype=np.int64)
+    return np.where(days == NO_DAY, np.nan, days.astype(float))
@@ -1,108 +1,235 @@
 import numpy as np 
 import pandas as pd 
-from collections import defaultdict
-from math import isfinite
 
-def months_since_last(ufc_df):
-    
-    fighter_last_event = defaultdict(lambda: [None])# keep last event date per fighter
-
-    months_since_red = []
-    months_since_blue = []
+from FeatureEngineering.dates import day_numbers, day_months
+from FeatureEngineering.fighter_state import engine_state
+from FeatureEngineering.kernels import streak_kernel
+from FeatureEngineering.odds_features import american_to_decimal
+
+HISTORY_BLOCKS = ['win_lose_streak', 'method_wins', 'method_win_pct', 'total_knockdowns',
+                  'total_bonus', 'avg_fight_time', 'months_since_last', 'count_fav_dog']
+
+def fighter_ids(df):
+    """Map fighter_red/fighter_blue names to dense integer ids, returns (red_ids, blue_ids, n_fighters)"""
+    names = pd.concat([df['fighter_red'], df['fighter_blue']], ignore_index=True)
+    codes, uniques = pd.factorize(names, use_na_sentinel=False)
+    n = df.shape[0]
+    return codes[:n], codes[n:], len(uniques)
+
+def bout_ids(df, appearances=None, state=None):
+    """Fighter ids for the bouts in df, from the FighterAppearances table or FighterState when given"""
+    if appearances is not None:
+        return appearances.ids()
+    if state is not None:
+        return state.fighter_ids(df)
+    return fighter_ids(df)
+
+def method_flags(df):
+    """Substring flags for DEC/KO/SUB in the method column, NaN methods flagged as missing"""
+    method = df['method']
+    has_method = method.notna().to_numpy()
+    method_str = method.where(method.notna(), '').astype(str)
+    is_dec = method_str.str.contains('DEC', regex=False).to_numpy()
+    is_ko = method_str.str.contains('KO', regex=False).to_numpy()
+    is_sub = method_str.str.contains('SUB', regex=False).to_numpy()
+    return has_method, is_dec, is_ko, is_sub
+
+def fighter_history(df, blocks=None, appearances=None, state=None, state_name='fighter_history'):
+    """
+    Single chronological pass over the bouts that fills every per-fighter history block at once.
+    df must already be sorted by date. Returns a dict keyed by block name, each value is the 
+    array the matching standalone function returns (e.g. history['win_lose_streak']).
+    Pre-fight values missing for debuts are NaN. appearances (FighterAppearances of df) reuses its fighter ids.
+    With a FighterState the pass starts from, and leaves behind, the accumulators stored under state_name.
+    """
+    if blocks is None:
+        blocks = [b for b in HISTORY_BLOCKS if b != 'total_knockdowns' or 'red_kd' in df.columns]
+        blocks = [b for b in blocks if b != 'count_fav_dog' or 'open_red' in df.columns]
+    blocks = set(blocks)
+
+    n = df.shape[0]
+    red_ids, blue_ids, n_fighters = bout_ids(df, appearances, state)
+
+    red_won = df['winner'].eq(1).to_numpy().tolist()
+    blue_won = df['winner'].eq(0).to_numpy().tolist()
+
+    do_streak = 'win_lose_streak' in blocks
+    do_method = 'method_wins' in blocks or 'method_win_pct' in blocks
+    do_kd = 'total_knockdowns' in blocks
+    do_bonus = 'total_bonus' in blocks
+    do_time = 'avg_fight_time' in blocks
+    do_months = 'months_since_last' in blocks
+    do_fav = 'count_fav_dog' in blocks
+
+    # per fighter state, indexed by fighter id
+    arrays = engine_state(state, state_name, n_fighters, {
+        'seen': (bool, False, ()),
+        'win_streak': (np.int64, 0, ()),
+        'lose_streak': (np.int64, 0, ()),
+        'n_fights': (np.int64, 0, ()),
+        'n_wins': (np.int64, 0, ()),
+        'method_win_counts': (np.int64, 0, (3,)), # dec, ko, sub wins
+        'pct_wins': (np.int64, 0, (3,)), # ko, dec, sub (first matching method)
+        'pct_total': (np.int64, 0, (3,)),
+        'kd_sum': (float, 0.0, ()),
+        'bonus_sum': (float, 0.0, ()),
+        'time_sum': (float, 0.0, ()),
+        'time_count': (np.int64, 0, ()),
+        'last_month': (float, np.nan, ()),
+    })
+    seen, win_streak, lose_streak = arrays['seen'], arrays['win_streak'], arrays['lose_streak']
+    n_fights, n_wins = arrays['n_fights'], arrays['n_wins']
+    method_win_counts, pct_wins, pct_total = arrays['method_win_counts'], arrays['pct_wins'], arrays['pct_total']
+    kd_sum, bonus_sum, time_sum, time_count = arrays['kd_sum'], arrays['bonus_sum'], arrays['time_sum'], arrays['time_count']
+    last_month = arrays['last_month']
+
+    # per bout outputs, column order matches the standalone functions
+    streak_out = np.zeros((n, 12))
+    if do_streak: # the streak and career counters have their own kernel, the loop below does the rest
+        streak_out = streak_kernel(red_ids, blue_ids, df['winner'].to_numpy(dtype=float), win_streak, lose_streak, n_fights, n_wins)
+    red_ids, blue_ids = red_ids.tolist(), blue_ids.tolist()
+    method_wins_out = np.zeros((n, 6), dtype=np.int64)
+    method_pct_out = np.zeros((n, 6))
+    kd_out = np.full((n, 2), np.nan)
+    bonus_out = np.full((n, 2), np.nan)
+    time_out = np.full((n, 2), np.nan)
+    months_out = np.full((n, 2), np.nan)
+
+    if do_method:
+        has_method, is_dec, is_ko, is_sub = method_flags(df)
+        dec_ko_sub = np.column_stack([is_dec, is_ko, is_sub]).astype(np.int64)
+        # method_win_pct only credits the first matching method in KO, DEC, SUB order
+        pct_type = np.select([is_ko, is_dec, is_sub], [0, 1, 2], default=-1)
+        pct_type[~has_method] = -1
+        has_method, pct_type = has_method.tolist(), pct_type.tolist()
+    if do_kd:
+        red_kd = df['red_kd'].to_numpy(dtype=float).tolist()
+        blue_kd = df['blue_kd'].to_numpy(dtype=float).tolist()
+    if do_bonus:
+        perf_bonus = df['performance_bonus_winner'].eq(1).to_numpy().tolist()
+        otn_bonus = df['fight_otn_bonus'].eq(1).to_numpy().tolist()
+    if do_time:
+        red_time = df['total_fight_time_red'].to_numpy(dtype=float).tolist()
+        blue_time = df['total_fight_time_blue'].to_numpy(dtype=float).tolist()
+    if do_months:
+        months = day_months(day_numbers(df['date'])).tolist()
+
+    for i in range(n):
+        r = red_ids[i]
+        b = blue_ids[i]
+        r_seen = seen[r]
+        b_seen = seen[b]
+
+        if do_method:
+            method_wins_out[i, :3] = method_win_counts[r]
+            method_wins_out[i, 3:] = method_win_counts[b]
+            r_total, b_total = pct_total[r], pct_total[b]
+            method_pct_out[i, :3] = np.divide(pct_wins[r], r_total, out=np.zeros(3), where=r_total > 0)
+            method_pct_out[i, 3:] = np.divide(pct_wins[b], b_total, out=np.zeros(3), where=b_total > 0)
+            if has_method[i]:
+                if red_won[i]:
+                    method_win_counts[r] += dec_ko_sub[i]
+                elif blue_won[i]:
+                    method_win_counts[b] += dec_ko_sub[i]
+                t = pct_type[i]
+                if t >= 0:
+                    pct_total[r, t] += 1
+                    pct_total[b, t] += 1
+                    if red_won[i]:
+                        pct_wins[r, t] += 1
+                    elif blue_won[i]:
+                        pct_wins[b, t] += 1
+
+        if do_kd:
+            if r_seen:
+                kd_out[i, 0] = kd_sum[r]
+            if b_seen:
+                kd_out[i, 1] = kd_sum[b]
+            kd_sum[r] += red_kd[i]
+            kd_sum[b] += blue_kd[i]
+
+        if do_bonus:
+            # performance bonus is only credited to the red corner, fight of the night to both
+            if r_seen:
+                bonus_out[i, 0] = bonus_sum[r]
+            if b_seen:
+                bonus_out[i, 1] = bonus_sum[b]
+            bonus_sum[r] += perf_bonus[i] + otn_bonus[i]
+            bonus_sum[b] += otn_bonus[i]
+
+        if do_time:
+            if time_count[r]:
+                time_out[i, 0] = time_sum[r] / time_count[r]
+            if time_count[b]:
+                time_out[i, 1] = time_sum[b] / time_count[b]
+            time_sum[r] += red_time[i]
+            time_sum[b] += blue_time[i]
+            time_count[r] += 1
+            time_count[b] += 1
+
+        if do_months:
+            if r_seen:
+                months_out[i, 0] = months[i] - last_month[r]
+            if b_seen:
+                months_out[i, 1] = months[i] - last_month[b]
+            last_month[r] = months[i]
+            last_month[b] = months[i]
+
+        seen[r] = True
+        seen[b] = True
+
+    outputs = {'win_lose_streak': streak_out, 'method_wins': method_wins_out, 'method_win_pct': method_pct_out,
+               'total_knockdowns': kd_out, 'total_bonus': bonus_out, 'avg_fight_time': time_out,
+               'months_since_last': months_out}
+    if do_fav: # grouped cumulative counts, no need for the loop
+        outputs['count_fav_dog'] = count_fav_dog(df, appearances, state, state_name)
+    return {block: outputs[block] for block in blocks}
 
-    for _, row in ufc_df.iterrows():
-        red_fighter = row['fighter_red']
-        blue_fighter = row['fighter_blue']
-        event_date = pd.to_datetime(row['date'])
+def months_since_last(ufc_df):
+    return fighter_history(ufc_df, blocks=['months_since_last'])['months_since_last']
 
-        # For red fighter
-        last_date_red = fighter_last_event.get(red_fighter)
-        if last_date_red is not None:
-            months_diff = (event_date.year - last_date_red.year) * 12 + (event_date.month - last_date_red.month)
-            months_since_red.append(months_diff)
-        else:
-            months_since_red.append(None)
+def mma_math(df, appearances=None, state=None):
+    """
+    1 if the fighter has beaten someone the opponent lost to, per corner. 
+    Each fighter's previous bout (last opponent and result) is folded into their win/loss opponent sets 
+    when they next appear, so every bout costs O(1) amortized instead of rescanning the history.
+    """
+    red_ids, blue_ids, n_fighters = bout_ids(df, appearances, state)
+    red_ids, blue_ids = red_ids.tolist(), blue_ids.tolist()
+    winner = df['winner'].to_numpy().tolist()
+
+    arrays = engine_state(state, 'mma_math', n_fighters, {
+        'last_opponent': (np.int64, -1, ()), # opponent in the fighter's most recent bout
+        'last_result': (np.int64, -1, ()), # 1 won, 0 lost, -1 no result
+        'wins': (object, set, ()),
+        'losses': (object, set, ()),
+    })
+    last_opponent, last_result = arrays['last_opponent'], arrays['last_result']
+    fighter_wins, fighter_losses = arrays['wins'], arrays['losses']
+
+    mma_math_red = np.zeros(df.shape[0], dtype=np.int64)
+    mma_math_blue = np.zeros(df.shape[0], dtype=np.int64)
+
+    for idx in range(df.shape[0]):
+        red_fighter = red_ids[idx]
+        blue_fighter = blue_ids[idx]
+
+        for fighter in (red_fighter, blue_fighter):
+            if last_result[fighter] == 1:
+                fighter_wins[fighter].add(last_opponent[fighter])
+            elif last_result[fighter] == 0:
+                fighter_losses[fighter].add(last_opponent[fighter])
+
+        # red has beaten someone blue lost to, and the reverse for blue
+        mma_math_red[idx] = not fighter_wins[red_fighter].isdisjoint(fighter_losses[blue_fighter])
+        mma_math_blue[idx] = not fighter_wins[blue_fighter].isdisjoint(fighter_losses[red_fighter])
+
+        last_opponent[red_fighter] = blue_fighter
+        last_opponent[blue_fighter] = red_fighter
+        result = winner[idx]
+        last_result[red_fighter] = 1 if result == 1 else 0 if result == 0 else -1
+        last_result[blue_fighter] = 1 if result == 0 else 0 if result == 1 else -1
 
-        # For blue fighter
-        last_date_blue = fighter_last_event.get(blue_fighter)
-        if last_date_blue is not None:
-            months_diff = (event_date.year - last_date_blue.year) * 12 + (event_date.month - last_date_blue.month)
-            months_since_blue.append(months_diff)
-        else:
-            months_since_blue.append(None)
-
-        # Update last seen dates
-        fighter_last_event[red_fighter] = event_date
-        fighter_last_event[blue_fighter] = event_date
-
-    # Add columns back to dataframe if you want
-
-    return np.column_stack([months_since_red, months_since_blue])
-
-def mma_math(df):
-    fighter_dic_wins = defaultdict(set)  # Use sets for faster lookup
-    fighter_dic_losses = defaultdict(set)
-
-    mma_math_red = []
-    mma_math_blue = []
-
-    for idx, row in df.iterrows(): 
-        red_fighter = row['fighter_red']
-        blue_fighter = row['fighter_blue']
-
-        # Slice the dataframe to get all previous rows before the current row
-        previous_fights = df.iloc[:idx]
-
-        # Get the most recent fight where red_fighter or blue_fighter appeared as red
-        red_history = previous_fights[
-            (previous_fights['fighter_red'] == red_fighter) | 
-            (previous_fights['fighter_blue'] == red_fighter)
-        ].tail(1)  # Ensures a DataFrame is returned
-
-        # Get the most recent fight where blue_fighter appeared as either red or blue
-        blue_history = previous_fights[
-            (previous_fights['fighter_red'] == blue_fighter) | 
-            (previous_fights['fighter_blue'] == blue_fighter)
-        ].tail(1)
-
-        if not red_history.empty:
-            red_history = red_history.iloc[0]  # Convert to Series
-            if red_history['fighter_red'] == red_fighter and red_history['winner'] == 1:
-                fighter_dic_wins[red_fighter].add(red_history['fighter_blue'])
-
-            if red_history['fighter_blue'] == red_fighter and red_history['winner'] == 0:
-                fighter_dic_wins[red_fighter].add(red_history['fighter_red'])
-
-            # Red fighter's opponents lost to
-            if red_history['fighter_red'] == red_fighter and red_history['winner'] == 0:
-                fighter_dic_losses[red_fighter].add(red_history['fighter_blue'])
-            
-            if red_history['fighter_blue'] == red_fighter and red_history['winner'] == 1:
-                fighter_dic_losses[red_fighter].add(red_history['fighter_red'])
-
-        if not blue_history.empty:
-            blue_history = blue_history.iloc[0]
-            # Get blue fighter's defeated opponents
-            if blue_history['fighter_red'] == blue_fighter and blue_history['winner'] == 1:               
-                fighter_dic_wins[blue_fighter].add(blue_history['fighter_blue'])
-
-            if blue_history['fighter_blue'] == blue_fighter and blue_history['winner'] == 0:
-                fighter_dic_wins[blue_fighter].add(blue_history['fighter_red'])
-
-            # Blue fighter's opponents lost to
-            if blue_history['fighter_red'] == blue_fighter and blue_history['winner'] == 0:
-                fighter_dic_losses[blue_fighter].add(blue_history['fighter_blue'])
-            
-            if blue_history['fighter_blue'] == blue_fighter and blue_history['winner'] == 1:
-                fighter_dic_losses[blue_fighter].add(blue_history['fighter_red'])
-
-        # Assign 1 if the red fighter has previously defeated the blue fighter, else 0
-        common_opponents_red = fighter_dic_wins[red_fighter] & fighter_dic_losses[blue_fighter]
-        mma_math_red.append(1 if common_opponents_red else 0)
-
-        # Check if there exists a fighter that blue beat and red lost to
-        common_opponents_blue = fighter_dic_wins[blue_fighter] & fighter_dic_losses[red_fighter]
-        mma_math_blue.append(1 if common_opponents_blue else 0)
     return np.column_stack([mma_math_red, mma_math_blue])
 
 def rolling_avg(values): # tune the window for rolling stats 
@@ -114,304 +241,160 @@ def rolling_avg(values): # tune the window for rolling stats
         total = sum(non_none_values) / len(non_none_values) 
         return total
     
-def count_fav_dog(df):
-    fighter_counts = defaultdict(lambda:defaultdict(int))
-    red_fav_counts = []
-    blue_fav_counts = []
-
-    red_dog_counts = []
-    blue_dog_counts = []
-
-    for i, row in df.iterrows(): 
-        red_fighter = row['fighter_red']
-        blue_fighter = row['fighter_blue']
-        red_open = row['open_red']
-        blue_open = row['open_blue']
-
-        if red_open <= blue_open: 
-            fighter_counts[red_fighter]['fav_counts'] += 1
-            fighter_counts[blue_fighter]['dog_counts'] += 1
-        else: 
-            fighter_counts[blue_fighter]['fav_counts'] += 1
-            fighter_counts[red_fighter]['dog_counts'] += 1
-
-        red_fav_counts.append(fighter_counts[red_fighter]['fav_counts'])
-        red_dog_counts.append(fighter_counts[red_fighter]['dog_counts'])
-
-        blue_fav_counts.append(fighter_counts[blue_fighter]['fav_counts'])
-        blue_dog_counts.append(fighter_counts[blue_fighter]['dog_counts'])
-
-    print(len(red_fav_counts), len(blue_fav_counts))
-    print('=========== fav counts ============')
-
-    assert len(red_fav_counts) == df.shape[0], 'bad fav counts'
-    return np.column_stack([red_fav_counts, red_dog_counts, blue_fav_counts, blue_dog_counts])
-                     
-def td_ratio(df):
-
-    ratio_dic = defaultdict(lambda: defaultdict(lambda: [None]))
-    td_dic = defaultdict(lambda: [None])
-
-    red_ratio = []
-    blue_ratio = []
-
-    for _, row in df.iterrows():
-        red_fighter = row['fighter_red']
-        blue_fighter = row['fighter_blue']
-
-        red_ratio.append(td_dic[red_fighter][-1])
-        blue_ratio.append(td_dic[blue_fighter][-1])
-
-        ratio_dic[red_fighter]['fighter_td'].append(row['td_landed_total_red'])
-        ratio_dic[red_fighter]['opponent_td'].append(row['td_landed_total_blue'])
-
-        ratio_dic[blue_fighter]['fighter_td'].append(row['td_landed_total_blue'])
-        ratio_dic[blue_fighter]['opponent_td'].append(row['td_landed_total_red'])
-        
-        red_td = np.sum([v if v is not None and not pd.isna(v) else 0 for v in ratio_dic[red_fighter]['fighter_td']])
-        red_opponent_td = np.sum([v if v is not None and not pd.isna(v) else 0 for v in ratio_dic[red_fighter]['opponent_td']])
-
-        blue_td = np.sum([v if v is not None and not pd.isna(v) else 0 for v in ratio_dic[blue_fighter]['fighter_td']])
-        blue_opponent_td = np.sum([v if v is not None and not pd.isna(v) else 0 for v in ratio_dic[blue_fighter]['opponent_td']])
-
-        red_ratio_curr = red_td / red_opponent_td if red_opponent_td != 0 else red_td 
-        blue_ratio_curr = blue_td / blue_opponent_td if blue_opponent_td !=0 else blue_td
+def fighter_cumsum(fighter, values, base=None):
+    """
+    Running sums of values per fighter, one row per appearance in chronological order, each row includes itself.
+    base (n_fighters, columns) carries sums in from earlier bouts: it is added to every row and updated
+    in place to each fighter's sums after these rows.
+    """
+    values = np.asarray(values).reshape(len(fighter), -1)
+    sums = pd.DataFrame(values).groupby(fighter, sort=False).cumsum().to_numpy()
+    if base is not None:
+        base = base.reshape(base.shape[0], -1)
+        sums = sums + base[fighter]
+        _, last = np.unique(fighter[::-1], return_index=True)
+        last_rows = len(fighter) - 1 - last
+        base[fighter[last_rows]] = sums[last_rows]
+    return sums
+
+def appearance_ids(df, appearances=None, state=None):
+    """Fighter id per appearance (red then blue of every bout) and the number of fighters"""
+    red_ids, blue_ids, n_fighters = bout_ids(df, appearances, state)
+    return np.column_stack([red_ids, blue_ids]).ravel(), n_fighters
+
+def count_fav_dog(df, appearances=None, state=None, state_name='fighter_history'):
+    """
+    Times each fighter was the opening favorite / underdog, this bout included (the line is known before the fight).
+    Red is the favorite when open_red <= open_blue, a missing line counts blue as the favorite.
+    Returns (fav red, dog red, fav blue, dog blue) per bout.
+    """
+    fighter, n_fighters = appearance_ids(df, appearances, state)
+    red_fav = (df['open_red'] <= df['open_blue']).to_numpy() # NaN comparisons are False
+    fav = np.column_stack([red_fav, ~red_fav]).ravel()
+    fav_dog = engine_state(state, state_name, n_fighters, {'fav_dog': (np.int64, 0, (2,))})['fav_dog']
+    counts = fighter_cumsum(fighter, np.column_stack([fav, ~fav]).astype(np.int64), fav_dog)
+    return counts.reshape(df.shape[0], 4)
 
-        td_dic[red_fighter].append(red_ratio_curr)
-        td_dic[blue_fighter].append(blue_ratio_curr)
+ODDS_LINES = ['open', 'close1', 'close2']
 
-    return np.column_stack([red_ratio, blue_ratio])
+def odds_counters(df, lines=ODDS_LINES, appearances=None, state=None, state_name='odds_counters'):
+    """
+    Career betting line counters before each bout, for every line (american odds columns {line}_red/{line}_blue)
+    in one grouped pass over the fighter appearances:
+        times_fav_{line}, times_dog_{line}: bouts the fighter had the shorter / longer price (equal prices or a missing line count neither)
+        upsets_won_{line}: wins as the underdog, upsets_lost_{line}: losses as the favorite
+        avg_dec_{line}: average decimal price of the bouts with a line, NaN until there is one
+    Returns a dict of {name}_{color} columns, counts are 0 on debut.
+    With a FighterState the counters resume from (and are left in) the state.
+    """
+    if not lines:
+        return {}
+    n = df.shape[0]
+    fighter, n_fighters = appearance_ids(df, appearances, state)
+    won = np.column_stack([df['winner'].eq(1).to_numpy(), df['winner'].eq(0).to_numpy()]).ravel()
+    lost = won.reshape(n, 2)[:, ::-1].ravel() # draws, no contests and upcoming bouts are neither
+    spec = {}
+    for line in lines:
+        spec[f'{line}_counts'] = (np.int64, 0, (4,))
+        spec[f'{line}_price'] = (float, 0.0, (2,)) # price sum, bouts with a price
+    arrays = engine_state(state, state_name, n_fighters, spec)
+
+    columns = {}
+    for line in lines:
+        price = np.column_stack([df[f'{line}_red'].to_numpy(dtype=float), df[f'{line}_blue'].to_numpy(dtype=float)])
+        opponent = price[:, ::-1].ravel()
+        price = price.ravel()
+        fav, dog = price < opponent, price > opponent # NaN comparisons are False
+        flags = np.column_stack([fav, dog, dog & won, fav & lost])
+        counts = fighter_cumsum(fighter, flags.astype(np.int64), arrays[f'{line}_counts']) - flags
+
+        has_price = ~np.isnan(price)
+        dec = np.where(has_price, american_to_decimal(np.where(has_price, price, 100.0)), 0.0)
+        sums = fighter_cumsum(fighter, np.column_stack([dec, has_price]), arrays[f'{line}_price'])
+        sums -= np.column_stack([dec, has_price])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg = np.where(sums[:, 1] > 0, sums[:, 0] / sums[:, 1], np.nan)
+
+        for name, values in [(f'times_fav_{line}', counts[:, 0]), (f'times_dog_{line}', counts[:, 1]),
+                             (f'upsets_won_{line}', counts[:, 2]), (f'upsets_lost_{line}', counts[:, 3]),
+                             (f'avg_dec_{line}', avg)]:
+            values = values.reshape(n, 2)
+            columns[f'{name}_red'], columns[f'{name}_blue'] = values[:, 0], values[:, 1]
+    return columns
+
+# fighter stat / opponent stat ratios, (red column, blue column) the running totals are built from
+RATIO_COLUMNS = {
+    'td_ratio': ('td_landed_total_red', 'td_landed_total_blue'),
+    'sig_strikes_ratio': ('sig_str_landed_total_red', 'sig_str_landed_total_blue'),
+    'control_pr_ratio': ('control_pm_red', 'control_pm_blue'),
+}
+
+def ratio_features(df, blocks=None, appearances=None, state=None):
+    """
+    Fused kernel for the career stat ratios, every ratio block comes out of one pass.
+    Keeps running totals of the fighter's and the opponent's values (NaN counted as 0) so each 
+    bout is O(1). The pre-fight value is the ratio after the fighter's previous bout, NaN on debut.
+    ratio = fighter total / opponent total, or the fighter total when the opponent total is 0.
+    """
+    if blocks is None:
+        blocks = list(RATIO_COLUMNS)
+
+    n = df.shape[0]
+    red_ids, blue_ids, n_fighters = bout_ids(df, appearances, state)
+    red_vals = np.nan_to_num(np.column_stack([df[RATIO_COLUMNS[b][0]].to_numpy(dtype=float) for b in blocks]))
+    blue_vals = np.nan_to_num(np.column_stack([df[RATIO_COLUMNS[b][1]].to_numpy(dtype=float) for b in blocks]))
+
+    # running totals are stored per ratio block so any subset of blocks can resume from a state
+    stored = [engine_state(state, f'ratio_{block}', n_fighters, {
+        'fighter_total': (float, 0.0, ()),
+        'opponent_total': (float, 0.0, ()),
+        'last_ratio': (float, np.nan, ()),
+    }) for block in blocks]
+    fighter_total = np.column_stack([arrays['fighter_total'] for arrays in stored])
+    opponent_total = np.column_stack([arrays['opponent_total'] for arrays in stored])
+    last_ratio = np.column_stack([arrays['last_ratio'] for arrays in stored])
+
+    red_out = np.empty((n, len(blocks)))
+    blue_out = np.empty((n, len(blocks)))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i, (r, b) in enumerate(zip(red_ids.tolist(), blue_ids.tolist())):
+            red_out[i] = last_ratio[r]
+            blue_out[i] = last_ratio[b]
+
+            fighter_total[r] += red_vals[i]
+            opponent_total[r] += blue_vals[i]
+            fighter_total[b] += blue_vals[i]
+            opponent_total[b] += red_vals[i]
+
+            for f in (r, b):
+                opp = opponent_total[f]
+                last_ratio[f] = np.where(opp != 0, fighter_total[f] / opp, fighter_total[f])
+
+    for j, arrays in enumerate(stored):
+        arrays['fighter_total'][:] = fighter_total[:, j]
+        arrays['opponent_total'][:] = opponent_total[:, j]
+        arrays['last_ratio'][:] = last_ratio[:, j]
+
+    return {block: np.column_stack([red_out[:, j], blue_out[:, j]]) for j, block in enumerate(blocks)}
 
+def td_ratio(df):
+    return ratio_features(df, blocks=['td_ratio'])['td_ratio']
 
 def sig_strikes_ratio(df):
-
-    ratio_dic = defaultdict(lambda: defaultdict(lambda: [None]))
-    stats_dic = defaultdict(lambda: [None])
-
-    red_ratio = []
-    blue_ratio = []
-
-    for _, row in df.iterrows():
-        red_fighter = row['fighter_red']
-        blue_fighter = row['fighter_blue']
-
-        red_ratio.append(stats_dic[red_fighter][-1])
-        blue_ratio.append(stats_dic[blue_fighter][-1])
-
-        ratio_dic[red_fighter]['fighter_control'].append(row['sig_str_landed_total_red'])
-        ratio_dic[red_fighter]['opponent_control'].append(row['sig_str_landed_total_blue'])
-
-        ratio_dic[blue_fighter]['fighter_control'].append(row['sig_str_landed_total_blue'])
-        ratio_dic[blue_fighter]['opponent_control'].append(row['sig_str_landed_total_red'])
-
-        red_control = np.sum([v for v in ratio_dic[red_fighter]['fighter_control'] if v is not None and not pd.isna(v)])
-        red_opponent_control = np.sum([v for v in ratio_dic[red_fighter]['opponent_control'] if v is not None and not pd.isna(v)])
-
-        blue_control = np.sum([v for v in ratio_dic[blue_fighter]['fighter_control'] if v is not None and not pd.isna(v)])
-        blue_opponent_control = np.sum([v for v in ratio_dic[blue_fighter]['opponent_control'] if v is not None and not pd.isna(v)])
-
-        red_ratio_curr = red_control / red_opponent_control if red_opponent_control != 0 else red_control 
-        blue_ratio_curr = blue_control / blue_opponent_control if blue_opponent_control !=0 else blue_control
-
-        stats_dic[red_fighter].append(red_ratio_curr)
-        stats_dic[blue_fighter].append(blue_ratio_curr)
-
-    return np.column_stack([red_ratio, blue_ratio])
+    return ratio_features(df, blocks=['sig_strikes_ratio'])['sig_strikes_ratio']
 
 def control_pr_ratio(df):
-
-    control_stats = defaultdict(lambda: defaultdict(lambda: []))
-    ratio_dic = defaultdict(lambda: [None])
-
-    red_ratio = []
-    blue_ratio = []
-
-    for _, row in df.iterrows():
-        red_fighter = row['fighter_red']
-        blue_fighter = row['fighter_blue']
-
-        red_ratio.append(ratio_dic[red_fighter][-1])
-        blue_ratio.append(ratio_dic[blue_fighter][-1])
-
-        control_stats[red_fighter]['fighter_control'].append(row['control_pm_red'])
-        control_stats[red_fighter]['opponent_control'].append(row['control_pm_blue'])
-
-        control_stats[blue_fighter]['fighter_control'].append(row['control_pm_blue'])
-        control_stats[blue_fighter]['opponent_control'].append(row['control_pm_red'])
-
-
-        red_control = np.sum([v for v in control_stats[red_fighter]['fighter_control'] if v is not None and not pd.isna(v)])
-        red_opponent_control = np.sum([v for v in control_stats[red_fighter]['opponent_control'] if v is not None and not pd.isna(v)])
-
-        blue_control = np.sum([v for v in control_stats[blue_fighter]['fighter_control'] if v is not None and not pd.isna(v)])
-        blue_opponent_control = np.sum([v for v in control_stats[blue_fighter]['opponent_control'] if v is not None and not pd.isna(v)])
-
-
-        red_ratio_curr = red_control / red_opponent_control if red_opponent_control != 0 else red_control 
-        blue_ratio_curr = blue_control / blue_opponent_control if blue_opponent_control !=0 else blue_control
-
-        ratio_dic[red_fighter].append(red_ratio_curr)
-        ratio_dic[blue_fighter].append(blue_ratio_curr)
-
-    return np.column_stack([red_ratio, blue_ratio])
+    return ratio_features(df, blocks=['control_pr_ratio'])['control_pr_ratio']
 
 def total_knockdowns(df):
-    fighter_dic = defaultdict(list)
-    red_kd = []
-    blue_kd = []
-
-    for _, row in df.iterrows():
-        red_fighter = row['fighter_red']
-        blue_fighter = row['fighter_blue']
-
-        if len(fighter_dic[red_fighter])==0:
-            red_kd.append(None)
-        else:
-            red_kd.append(sum(fighter_dic[red_fighter]))
-
-        if len(fighter_dic[blue_fighter])==0:
-            blue_kd.append(None)
-        else:
-            blue_kd.append(sum(fighter_dic[blue_fighter])) 
-
-        #update after fight
-        fighter_dic[red_fighter].append(row['red_kd'])
-        fighter_dic[blue_fighter].append(row['blue_kd'])
-    
-    return np.column_stack([red_kd,blue_kd])
+    return fighter_history(df, blocks=['total_knockdowns'])['total_knockdowns']
 
 def total_bonus(df):
-
-    red_bonus = []
-    blue_bonus = []
-
-    fighter_dic = defaultdict(list)
-
-    for i, row in df.iterrows():
-        red_fighter = row['fighter_red']
-        blue_fighter = row['fighter_blue']
-        
-        # update bonus history 
-        if len(fighter_dic[red_fighter]) == 0:
-            red_bonus.append(None)
-        else: 
-            red_bonus.append(np.sum([x for x in fighter_dic[red_fighter] if x is not None]))
-        
-        if len(fighter_dic[blue_fighter]) == 0:
-            blue_bonus.append(None)
-        else:
-            blue_bonus.append(np.sum([x for x in fighter_dic[blue_fighter] if x is not None]))
-
-        # current fight update
-        if row['performance_bonus_winner'] == 1:
-            fighter_dic[red_fighter].append(1)
-
-        else:
-            fighter_dic[red_fighter].append(0)
-
-        if row['fight_otn_bonus'] == 1:
-            fighter_dic[red_fighter].append(1)
-            fighter_dic[blue_fighter].append(1)
-        
-        else:
-            fighter_dic[blue_fighter].append(0)
-
-    return np.column_stack([red_bonus, blue_bonus])
+    return fighter_history(df, blocks=['total_bonus'])['total_bonus']
 
 def win_lose_streak(df):
-    # Initialize with default lists
-    fighter_dic = defaultdict(lambda: defaultdict(lambda: [0]))
-    wins = defaultdict(lambda: [None])  # store past wins (1/0)
-    
-    # Lists to collect features
-    red_win_streak, blue_win_streak = [], []
-    red_lose_streak, blue_lose_streak = [], []
-
-    wins_pct_red, wins_pct_blue = [], []
-    num_fights_red, num_fights_blue = [], []
-    num_wins_red, num_wins_blue = [], []
-    num_losses_red, num_losses_blue = [], []
-
-    for _, row in df.iterrows():
-        red = row['fighter_red']
-        blue = row['fighter_blue']
-
-        # Read streaks before this fight
-        red_win_streak.append(fighter_dic[red]['win_streak'][-1])
-        red_lose_streak.append(fighter_dic[red]['lose_streak'][-1])
-        blue_win_streak.append(fighter_dic[blue]['win_streak'][-1])
-        blue_lose_streak.append(fighter_dic[blue]['lose_streak'][-1])
-
-        # Collect past fight results, excluding initial None
-        red_results = [v for v in wins[red] if v is not None]
-        blue_results = [v for v in wins[blue] if v is not None]
-
-        # Num of fights so far
-        num_fights_red.append(len(red_results))
-        num_fights_blue.append(len(blue_results))
-
-        # Num of wins
-        num_wins_red.append(sum(red_results) if red_results else 0)
-        num_wins_blue.append(sum(blue_results) if blue_results else 0)
-
-        # Num of losses = total fights - wins
-        num_losses_red.append(len(red_results) - sum(red_results) if red_results else 0)
-        num_losses_blue.append(len(blue_results) - sum(blue_results) if blue_results else 0)
-
-        # Win percentage (avoid div by zero)
-        wins_pct_red.append(
-            sum(red_results) / len(red_results) if red_results else 0
-        )
-        wins_pct_blue.append(
-            sum(blue_results) / len(blue_results) if blue_results else 0
-        )
-
-        # Update fighter_dic & wins after this fight
-        if row['winner'] == 1:
-            # red won
-            fighter_dic[red]['win_streak'].append(fighter_dic[red]['win_streak'][-1] + 1)
-            fighter_dic[red]['lose_streak'].append(0)
-
-            fighter_dic[blue]['win_streak'].append(0)
-            fighter_dic[blue]['lose_streak'].append(fighter_dic[blue]['lose_streak'][-1] + 1)
-
-            wins[red].append(1)
-            wins[blue].append(0)
-
-        elif row['winner'] == 0:
-            # blue won
-            fighter_dic[blue]['win_streak'].append(fighter_dic[blue]['win_streak'][-1] + 1)
-            fighter_dic[blue]['lose_streak'].append(0)
-
-            fighter_dic[red]['win_streak'].append(0)
-            fighter_dic[red]['lose_streak'].append(fighter_dic[red]['lose_streak'][-1] + 1)
-
-            wins[red].append(0)
-            wins[blue].append(1)
-
-        else:
-            # Optional: handle draw/no contest etc.
-            fighter_dic[red]['win_streak'].append(0)
-            fighter_dic[red]['lose_streak'].append(0)
-            fighter_dic[blue]['win_streak'].append(0)
-            fighter_dic[blue]['lose_streak'].append(0)
-            wins[red].append(0)
-            wins[blue].append(0)
-
-    return np.column_stack([
-        red_win_streak,
-        red_lose_streak,
-        blue_win_streak,
-        blue_lose_streak,
-        wins_pct_red,
-        wins_pct_blue,
-        num_fights_red,
-        num_fights_blue,
-        num_wins_red,
-        num_wins_blue,
-        num_losses_red,
-        num_losses_blue
-    ])
+    return fighter_history(df, blocks=['win_lose_streak'])['win_lose_streak']
 
 def womens_fight(df):
     weight_classes = []
@@ -428,155 +411,14 @@ def womens_fight(df):
     return weight_classes 
 
 def method_wins(df):
-    fighter_dic = defaultdict(lambda: defaultdict(int))  # Set the default type to int for counting wins
-    
-    # Lists to store the results
-    decision_wins_red = []
-    ko_wins_red = []
-    sub_wins_red = []
-    total_red = []
-
-    decision_wins_blue = []
-    ko_wins_blue = []
-    sub_wins_blue = []
-    total_blue = []
-
-    for _, row in df.iterrows():
-        red = row['fighter_red']
-        blue = row['fighter_blue']
-        
-        # Ensure each fighter has an initialized dictionary for win methods
-        if red not in fighter_dic:
-            fighter_dic[red] = defaultdict(int)
-        if blue not in fighter_dic:
-            fighter_dic[blue] = defaultdict(int)
-
-        # Append the current method wins before the fight
-        decision_wins_red.append(fighter_dic[red]['dec_wins'])
-        ko_wins_red.append(fighter_dic[red]['ko_wins'])
-        sub_wins_red.append(fighter_dic[red]['sub_wins'])
-        total_red.append(fighter_dic[red]['total_wins'])
-
-        decision_wins_blue.append(fighter_dic[blue]['dec_wins'])
-        ko_wins_blue.append(fighter_dic[blue]['ko_wins'])
-        sub_wins_blue.append(fighter_dic[blue]['sub_wins'])
-        total_blue.append(fighter_dic[blue]['total_wins'])
-
-        if pd.isna(row['method']):
-            continue
-
-        # Update the win counts based on the current fight
-        if 'DEC' in row['method'] and row['winner'] == 1:
-            fighter_dic[red]['dec_wins'] += 1
-        if 'KO' in row['method'] and row['winner'] == 1:
-            fighter_dic[red]['ko_wins'] += 1
-        if 'SUB' in row['method'] and row['winner'] == 1:
-            fighter_dic[red]['sub_wins'] += 1
-        if row['winner'] == 1:
-            fighter_dic[red]['total_wins'] += 1
-
-        if 'DEC' in row['method'] and row['winner'] == 0:
-            fighter_dic[blue]['dec_wins'] += 1
-        if 'KO' in row['method'] and row['winner'] == 0:
-            fighter_dic[blue]['ko_wins'] += 1
-        if 'SUB' in row['method'] and row['winner'] == 0:
-            fighter_dic[blue]['sub_wins'] += 1
-        if row['winner'] == 0:
-            fighter_dic[blue]['total_wins'] += 1
-
-    # Stack the results into an array for easy assignment to the DataFrame
-    return np.column_stack([
-        decision_wins_red,
-        ko_wins_red,
-        sub_wins_red,
-        decision_wins_blue,
-        ko_wins_blue,
-        sub_wins_blue
-    ])
+    return fighter_history(df, blocks=['method_wins'])['method_wins']
 
 def method_win_pct(df):
     """
     Compute per-fight historical win percentages by method 
     (KO, DEC, SUB) for each fighter before each fight.
     """
-    # running history per fighter
-    fighter_history = defaultdict(lambda: defaultdict(lambda: {'wins': 0, 'total': 0}))
-
-    # results
-    red_ko_pct, red_dec_pct, red_sub_pct = [], [], []
-    blue_ko_pct, blue_dec_pct, blue_sub_pct = [], [], []
-
-    for _, row in df.iterrows():
-        red, blue = row['fighter_red'], row['fighter_blue']
-        method = row.get('method', None)
-
-        # initialize for both fighters
-        for fighter in [red, blue]:
-            for m in ['KO', 'DEC', 'SUB']:
-                if m not in fighter_history[fighter]:
-                    fighter_history[fighter][m] = {'wins': 0, 'total': 0}
-
-        # record pre-fight win percentage
-        def get_pct(fighter, method_type):
-            stats = fighter_history[fighter][method_type]
-            return stats['wins'] / stats['total'] if stats['total'] > 0 else 0.0
-
-        red_ko_pct.append(get_pct(red, 'KO'))
-        red_dec_pct.append(get_pct(red, 'DEC'))
-        red_sub_pct.append(get_pct(red, 'SUB'))
-        blue_ko_pct.append(get_pct(blue, 'KO'))
-        blue_dec_pct.append(get_pct(blue, 'DEC'))
-        blue_sub_pct.append(get_pct(blue, 'SUB'))
-
-        if pd.isna(method):
-            continue
-
-        # determine method type
-        method_type = None
-        for m in ['KO', 'DEC', 'SUB']:
-            if m in method:
-                method_type = m
-                break
-        if method_type is None:
-            continue
-
-        # update total appearances
-        fighter_history[red][method_type]['total'] += 1
-        fighter_history[blue][method_type]['total'] += 1
-
-        # update wins
-        if row['winner'] == 1:
-            fighter_history[red][method_type]['wins'] += 1
-        elif row['winner'] == 0:
-            fighter_history[blue][method_type]['wins'] += 1
-
-    return np.column_stack([
-        red_ko_pct, red_dec_pct, red_sub_pct,
-        blue_ko_pct, blue_dec_pct, blue_sub_pct
-    ])
+    return fighter_history(df, blocks=['method_win_pct'])['method_win_pct']
 
 def avg_fight_time(df_):
-    df = df_.copy()
-
-    fight_time_dict = defaultdict(list)
-
-    avg_min_red = []
-    avg_min_blue = []
-
-    for _, row in df.iterrows():
-        red_fighter = row['fighter_red']
-        blue_fighter = row['fighter_blue']
-
-        avg_min_red.append(
-                            np.mean([t for t in fight_time_dict[red_fighter] if t is not None])
-                            if len(fight_time_dict[red_fighter]) > 0 else None
-                        )
-        avg_min_blue.append(
-                            np.mean([t for t in fight_time_dict[blue_fighter] if t is not None])
-                            if len(fight_time_dict[blue_fighter]) > 0 else None
-                        )
-
-        fight_time_dict[red_fighter].append(row['total_fight_time_red'])
-        fight_time_dict[blue_fighter].append(row['total_fight_time_blue'])
-
-    return np.column_stack([avg_min_red, avg_min_blue])
\ No newline at end of file
+    return fighter_history(df_, blocks=['avg_fight_time'])['avg_fight_time']
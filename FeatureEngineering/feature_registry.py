@@ -0,0 +1,377 @@
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import hashlib
+import inspect
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import FeatureEngineering.rolling_windows as rolling_windows
+from FeatureEngineering.feature_functions import fighter_history, mma_math, ratio_features, womens_fight
+from FeatureEngineering.appearances import FighterAppearances
+from RatingAlgos.elo import elo_rating
+from RatingAlgos.glicko import glicko_rating
+from RatingAlgos.glicko2 import glicko2_rating
+
+FIGHTERS = ['fighter_red', 'fighter_blue']
+STRIKING_FEATURES = ['kd', 'sig_str_landed', 'sig_str_absorbed', 'sig_str_attempted', 'leg_str', 'head_str', 'body_str', 'clinch_str']
+GRAPPLING_FEATURES = ['td_landed', 'td_attempted', 'control', 'sub_att', 'reverse']
+FIGHTER_ATTR = ['age', 'height', 'reach']
+
+# settings of the rating engines behind the elo/glicko/glicko2 blocks, part of the cache key
+# elo corner_advantage/mov 0 is plain elo (see elo_sweep), glicko period_days None counts every bout as one
+# rating period, glicko2 rating periods are event dates and period_days only adds the RD growth of the periods
+# a fighter sat out
+RATING_PARAMS = {
+    'elo': {'k': 32, 'corner_advantage': 0.0, 'mov': 0.0},
+    'glicko': {'period_days': None, 'c': 34, 'initial_rd': 350},
+    'glicko2': {'tau': 0.3, 'period_days': None},
+}
+
+# settings picked by the rating search (RatingAlgos/tuning.py --save), loaded over the defaults above
+RATING_PARAMS_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'rating_params.json'))
+
+def load_rating_params(path=RATING_PARAMS_FILE):
+    if os.path.exists(path):
+        with open(path) as f:
+            for engine, params in json.load(f).items():
+                RATING_PARAMS.setdefault(engine, {}).update(params)
+
+load_rating_params()
+
+def red_blue(prefixes):
+    return [f'{prefix}_{color}' for prefix in prefixes for color in ['red', 'blue']]
+
+def history_compute(block):
+    """Blocks of fighter_history share one pass, filled for every history block of the plan on first use"""
+    def compute(df, context):
+        if block not in context['history']:
+            blocks = [b for b in context['history_blocks'] if b not in context['history']]
+            context['history'].update(fighter_history(df, blocks=blocks, appearances=context['appearances'], state=context['state']))
+        return context['history'][block]
+    return compute
+
+def diff_compute(prefixes):
+    """{prefix}_red - {prefix}_blue for every prefix"""
+    def compute(df, context):
+        return np.column_stack([(df[f'{p}_red'] - df[f'{p}_blue']).to_numpy() for p in prefixes])
+    return compute
+
+def with_diffs(values, pairs):
+    """Append red - blue columns to a block's values, pairs are (red column, blue column) positions"""
+    values = np.asarray(values, dtype=float)
+    return np.column_stack([values] + [values[:, red] - values[:, blue] for red, blue in pairs])
+
+def diff_block(prefixes):
+    return {'inputs': red_blue(prefixes), 'outputs': [f'{p}_diff' for p in prefixes], 'compute': diff_compute(prefixes)}
+
+def elo_compute(df, context):
+    params = RATING_PARAMS['elo']
+    values = elo_rating(df, params['k'], context['appearances'], context['state'], params['corner_advantage'], params['mov'])
+    return with_diffs(values, [(0, 1)])
+
+def glicko_compute(df, context):
+    # glicko_red, glicko_blue, glicko_rd_red, glicko_rd_blue, then rd diff before rating diff
+    values = glicko_rating(df, context['appearances'], context['state'], **RATING_PARAMS['glicko'])
+    return with_diffs(values, [(2, 3), (0, 1)])
+
+def glicko2_compute(df, context):
+    # rating, rd and volatility per corner, then rd diff before rating diff like glicko
+    values = glicko2_rating(df, context['appearances'], context['state'], **RATING_PARAMS['glicko2'])
+    return with_diffs(values, [(2, 3), (0, 1)])
+
+def mma_math_compute(df, context):
+    return mma_math(df, context['appearances'], context['state'])
+
+def womens_fight_compute(df, context):
+    return pd.Series(womens_fight(df)).to_numpy()
+
+def ratios_compute(df, context):
+    ratios = ratio_features(df, appearances=context['appearances'], state=context['state'])
+    values = np.column_stack([ratios['td_ratio'], ratios['control_pr_ratio'], ratios['sig_strikes_ratio']])
+    return with_diffs(values, [(0, 1), (2, 3), (4, 5)])
+
+WIN_LOSE_COLUMNS = ['win_streak_red', 'lose_streak_red', 'win_streak_blue', 'lose_streak_blue',
+                    'win_pct_red', 'win_pct_blue', 'num_fights_red', 'num_fights_blue',
+                    'num_wins_red', 'num_wins_blue', 'num_losses_red', 'num_losses_blue']
+
+# Every non rolling feature block, name -> input columns, output columns (in column order) and compute(df, context).
+# A block whose inputs are another block's outputs depends on it, the dict order is the output column order.
+FEATURE_BLOCKS = {
+    'stat_diffs': diff_block([f'{feature}_{type}' for feature in STRIKING_FEATURES + GRAPPLING_FEATURES
+                              for type in ['total', 'pm']] + FIGHTER_ATTR),
+    'avg_fight_time': {
+        'inputs': FIGHTERS + ['total_fight_time_red', 'total_fight_time_blue'],
+        'outputs': ['avg_fight_min_red', 'avg_fight_min_blue'],
+        'compute': history_compute('avg_fight_time'),
+    },
+    'avg_fight_time_diff': diff_block(['avg_fight_min']),
+    'total_bonus': {
+        'inputs': FIGHTERS + ['winner', 'performance_bonus_winner', 'fight_otn_bonus'],
+        'outputs': ['total_bonus_red', 'total_bonus_blue'],
+        'compute': history_compute('total_bonus'),
+    },
+    'total_bonus_diff': diff_block(['total_bonus']),
+    'elo': {
+        'inputs': FIGHTERS + ['winner', 'method'],
+        'outputs': ['elo_red', 'elo_blue', 'elo_diff'],
+        'compute': elo_compute,
+    },
+    'glicko': {
+        'inputs': FIGHTERS + ['winner', 'date'],
+        'outputs': ['glicko_red', 'glicko_blue', 'glicko_rd_red', 'glicko_rd_blue', 'glicko_rd_diff', 'glicko_diff'],
+        'compute': glicko_compute,
+    },
+    'glicko2': {
+        'inputs': FIGHTERS + ['winner', 'date'],
+        'outputs': ['glicko2_red', 'glicko2_blue', 'glicko2_rd_red', 'glicko2_rd_blue', 'glicko2_vol_red', 'glicko2_vol_blue',
+                    'glicko2_rd_diff', 'glicko2_diff'],
+        'compute': glicko2_compute,
+    },
+    'mma_math': {
+        'inputs': FIGHTERS + ['winner'],
+        'outputs': ['math_red', 'math_blue'],
+        'compute': mma_math_compute,
+    },
+    'months_since_last': {
+        'inputs': FIGHTERS + ['date'],
+        'outputs': ['months_since_red', 'months_since_blue'],
+        'compute': history_compute('months_since_last'),
+    },
+    'months_since_diff': diff_block(['months_since']),
+    'win_lose_streak': {
+        'inputs': FIGHTERS + ['winner'],
+        'outputs': WIN_LOSE_COLUMNS,
+        'compute': history_compute('win_lose_streak'),
+    },
+    'win_lose_diffs': {
+        'inputs': WIN_LOSE_COLUMNS,
+        'outputs': ['num_fights_diff', 'win_streak_diff', 'lose_streak_diff', 'wins_diff', 'losses_diff', 'win_pct_diff'],
+        'compute': diff_compute(['num_fights', 'win_streak', 'lose_streak', 'num_wins', 'num_losses', 'win_pct']),
+    },
+    'method_wins': {
+        'inputs': FIGHTERS + ['winner', 'method'],
+        'outputs': ['decision_wins_red', 'ko_wins_red', 'sub_wins_red', 'decision_wins_blue', 'ko_wins_blue', 'sub_wins_blue'],
+        'compute': history_compute('method_wins'),
+    },
+    'method_wins_diffs': diff_block(['decision_wins', 'ko_wins', 'sub_wins']),
+    'method_win_pct': {
+        'inputs': FIGHTERS + ['winner', 'method'],
+        'outputs': ['ko_pct_red', 'dec_pct_red', 'sub_pct_red', 'ko_pct_blue', 'dec_pct_blue', 'sub_pct_blue'],
+        'compute': history_compute('method_win_pct'),
+    },
+    'womens_fight': {
+        'inputs': ['weight_class'],
+        'outputs': ['womens_fight'],
+        'compute': womens_fight_compute,
+    },
+    'ratios': {
+        'inputs': FIGHTERS + ['td_landed_total_red', 'td_landed_total_blue', 'sig_str_landed_total_red',
+                              'sig_str_landed_total_blue', 'control_pm_red', 'control_pm_blue'],
+        'outputs': ['ratio_td_red', 'ratio_td_blue', 'ratio_control_red', 'ratio_control_blue',
+                    'ratio_sigstrike_red', 'ratio_sigstrike_blue', 'ratio_td_diff', 'ratio_control_diff', 'ratio_sigstrike_diff'],
+        'compute': ratios_compute,
+    },
+}
+
+HISTORY_FEATURE_BLOCKS = ['avg_fight_time', 'total_bonus', 'months_since_last', 'win_lose_streak', 'method_wins', 'method_win_pct']
+
+CODE_PACKAGES = ('FeatureEngineering', 'RatingAlgos')
+
+def project_modules(roots):
+    """
+    The root modules and every FeatureEngineering/RatingAlgos module they import, directly or through each other
+    (modules, functions and classes taken from them), sorted by name so the list does not depend on import order.
+    """
+    found = {}
+    pending = list(roots)
+    while pending:
+        module = pending.pop()
+        if module.__name__ in found:
+            continue
+        found[module.__name__] = module
+        for value in vars(module).values():
+            name = value.__name__ if inspect.ismodule(value) else getattr(value, '__module__', None)
+            if isinstance(name, str) and name.split('.')[0] in CODE_PACKAGES and name not in found and name in sys.modules:
+                pending.append(sys.modules[name])
+    return [found[name] for name in sorted(found)]
+
+# modules whose source is part of the cache key, editing any of them invalidates cached blocks: everything the
+# blocks import, plus rolling_windows whose columns the blocks read
+CODE_MODULES = project_modules([sys.modules[__name__], rolling_windows])
+
+def code_version():
+    source = ''.join(inspect.getsource(module) for module in CODE_MODULES) + repr(RATING_PARAMS)
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+def resolve_features(features=None):
+    """
+    Blocks to compute, in dependency order, for the requested block names or output columns (None: every block).
+    Blocks producing the inputs of a requested block are pulled in first.
+    """
+    producers = {col: name for name, block in FEATURE_BLOCKS.items() for col in block['outputs']}
+    if features is None:
+        features = list(FEATURE_BLOCKS)
+
+    plan = []
+    visiting = set()
+
+    def visit(name):
+        if name in plan:
+            return
+        if name in visiting:
+            raise ValueError(f"feature block {name} depends on itself")
+        visiting.add(name)
+        for col in FEATURE_BLOCKS[name]['inputs']:
+            if col in producers:
+                visit(producers[col])
+        visiting.discard(name)
+        plan.append(name)
+
+    for feature in features:
+        if feature in FEATURE_BLOCKS:
+            visit(feature)
+        elif feature in producers:
+            visit(producers[feature])
+        else:
+            raise ValueError(f"unknown feature {feature}")
+    return plan
+
+def input_hash(df, block_name, version):
+    """Hash of a block's input columns, the block name and the code version"""
+    inputs = FEATURE_BLOCKS[block_name]['inputs']
+    hashed = pd.util.hash_pandas_object(df[inputs], index=False).to_numpy()
+    key = hashlib.sha256()
+    key.update(f'{block_name}|{version}|{"|".join(inputs)}'.encode())
+    key.update(hashed.tobytes())
+    return key.hexdigest()[:24]
+
+def producers_of(plan):
+    """output column -> block for the blocks of a plan"""
+    return {col: name for name in plan for col in FEATURE_BLOCKS[name]['outputs']}
+
+# bout table of the pool workers, rebuilt once per worker from shared memory by init_worker
+worker_data = {}
+
+def init_worker(shared_columns, object_columns):
+    """Pool initializer, numeric columns are views of the parent's shared memory, the rest arrive pickled once"""
+    columns = {}
+    for col, (shm_name, dtype, length) in shared_columns.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        worker_data.setdefault('shm', []).append(shm) # keep the mapping alive as long as the worker
+        columns[col] = np.ndarray(length, dtype=dtype, buffer=shm.buf)
+    columns.update(object_columns)
+    worker_data['df'] = pd.DataFrame(columns, copy=False)
+
+def run_blocks(names):
+    """Compute blocks on the worker's bout table, the history blocks of one task share their pass"""
+    df = worker_data['df']
+    context = {'appearances': None, 'state': None, 'history': {},
+               'history_blocks': [name for name in names if name in HISTORY_FEATURE_BLOCKS]}
+    return {name: np.asarray(FEATURE_BLOCKS[name]['compute'](df, context)) for name in names}
+
+def parallel_blocks(df, names, n_jobs):
+    """
+    Compute blocks that only read base columns in a process pool, returns {block: values}.
+    Their input columns are copied into shared memory once (strings are pickled once per worker) and every
+    fighter_history block goes to one task so they still share a single pass.
+    """
+    history = [name for name in names if name in HISTORY_FEATURE_BLOCKS]
+    tasks = ([history] if history else []) + [[name] for name in names if name not in HISTORY_FEATURE_BLOCKS]
+    inputs = list(dict.fromkeys(col for name in names for col in FEATURE_BLOCKS[name]['inputs']))
+
+    shared, shared_columns, object_columns = [], {}, {}
+    try:
+        for col in inputs:
+            values = df[col].to_numpy()
+            if isinstance(df[col].dtype, np.dtype) and values.dtype != object and values.nbytes:
+                shm = shared_memory.SharedMemory(create=True, size=values.nbytes)
+                shared.append(shm)
+                np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+                shared_columns[col] = (shm.name, values.dtype, len(values))
+            else:
+                object_columns[col] = df[col].reset_index(drop=True)
+
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks)), initializer=init_worker,
+                                 initargs=(shared_columns, object_columns)) as pool:
+            results = {}
+            for result in pool.map(run_blocks, tasks):
+                results.update(result)
+    finally:
+        for shm in shared:
+            shm.close()
+            shm.unlink()
+    return results
+
+def compute_features(df_, features=None, appearances=None, state=None, cache_dir=None, n_jobs=1):
+    """
+    Add the requested feature blocks (and the blocks they depend on) to df_, the date sorted output of apply_rolling_stats.
+    With a cache_dir each block's columns are stored on disk keyed by input_hash and loaded instead of recomputed
+    when nothing they depend on changed. The cache is skipped with a FighterState since blocks then advance the state.
+    n_jobs > 1 computes the blocks that only read base columns in parallel (see parallel_blocks), the dependent
+    blocks follow serially and columns are always added in plan order.
+    df_ is not changed, the new columns are joined onto it once at the end.
+    """
+    plan = resolve_features(features)
+    if appearances is None:
+        appearances = FighterAppearances(df_, state)
+
+    context = {
+        'appearances': appearances,
+        'state': state,
+        'history': {},
+        'history_blocks': [name for name in plan if name in HISTORY_FEATURE_BLOCKS],
+    }
+    use_cache = cache_dir is not None and state is None
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        version = code_version()
+
+    produced = producers_of(plan)
+    for name in plan:
+        missing = [col for col in FEATURE_BLOCKS[name]['inputs'] if col not in df_.columns and col not in produced]
+        if missing:
+            raise ValueError(f"feature block {name} is missing input columns {missing}")
+
+    added = {}
+    def block_frame(name):
+        """df_ itself for blocks on base columns, a frame of just their inputs for blocks on other blocks' outputs"""
+        inputs = FEATURE_BLOCKS[name]['inputs']
+        if not any(col in added for col in inputs):
+            return df_
+        return pd.DataFrame({col: added[col] if col in added else df_[col].to_numpy() for col in inputs}, index=df_.index)
+
+    def cache_path(name, frame):
+        return os.path.join(cache_dir, f'{name}_{input_hash(frame, name, version)}.pkl') if use_cache else None
+
+    computed = {}
+    if n_jobs > 1 and state is None:
+        independent = [name for name in plan if not any(col in produced for col in FEATURE_BLOCKS[name]['inputs'])]
+        independent = [name for name in independent if not use_cache or not os.path.exists(cache_path(name, df_))]
+        if len(independent) > 1:
+            computed = parallel_blocks(df_, independent, n_jobs)
+
+    for name in plan:
+        block = FEATURE_BLOCKS[name]
+        frame = block_frame(name)
+        path = cache_path(name, frame)
+        if name not in computed and path is not None and os.path.exists(path):
+            values = pd.read_pickle(path).to_numpy()
+        else:
+            values = computed[name] if name in computed else np.asarray(block['compute'](frame, context))
+            if path is not None:
+                pd.DataFrame(values.reshape(df_.shape[0], -1), columns=block['outputs']).to_pickle(path)
+
+        values = values.reshape(df_.shape[0], -1)
+        for j, col in enumerate(block['outputs']):
+            added[col] = values[:, j]
+
+    kept = df_.drop(columns=[col for col in added if col in df_.columns])
+    return pd.concat([kept, pd.DataFrame(added, index=df_.index)], axis=1)
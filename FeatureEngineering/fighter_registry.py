@@ -0,0 +1,127 @@
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+
+from FeatureEngineering.name_resolver import NameResolver
+
+class FighterRegistry:
+    """
+    Persistent fighter name -> dense int32 id map, built once from the scraped history and reused by every engine.
+
+    names[id] is the canonical spelling of fighter id (the first one registered), ids maps every known spelling,
+    canonical names and aliases, to its id so spelling variants of one fighter share one history.
+    Ids never change once assigned, unseen names get the next id, so engine arrays indexed by id, saved
+    FighterStates and registries from earlier runs stay aligned.
+    Saved as a csv of (name, fighter_id) rows, canonical spelling first, which can be edited by hand to fix aliases.
+    """
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        for name in names:
+            self.add(name)
+
+    @property
+    def n_fighters(self):
+        return len(self.names)
+
+    def add(self, name):
+        """Id of name, registered as a new fighter when unseen"""
+        fighter = self.ids.get(name)
+        if fighter is None:
+            fighter = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return fighter
+
+    def add_alias(self, alias, name):
+        """Map alias to the fighter of name (registered when unseen), an alias can not move to another fighter"""
+        fighter = self.add(name)
+        current = self.ids.setdefault(alias, fighter)
+        if current != fighter:
+            raise ValueError(f"'{alias}' is already fighter {current} ({self.names[current]}), not {self.names[fighter]}")
+        return fighter
+
+    def add_aliases(self, names, min_score=0.9):
+        """
+        Spellings in names that are not registered become aliases of the closest canonical name scoring at least
+        min_score (see NameResolver), the rest are left unregistered. Returns {alias: canonical name} of the new aliases.
+        """
+        unseen = [name for name in pd.unique(pd.Series(names).dropna()) if name not in self.ids]
+        if not unseen or not self.names:
+            return {}
+        resolver = NameResolver(self.names)
+        fighters, _ = resolver.resolve_many(unseen, min_score)
+        added = {}
+        for alias, fighter in zip(unseen, fighters.tolist()):
+            if fighter >= 0:
+                self.ids[alias] = fighter
+                added[alias] = self.names[fighter]
+        return added
+
+    def lookup(self, names):
+        """int32 ids of a column of names, -1 for unregistered or missing names"""
+        codes, uniques = pd.factorize(pd.Series(names))
+        lookup = np.array([self.ids.get(name, -1) for name in uniques] + [-1], dtype=np.int32)
+        return lookup[codes]
+
+    def canonical(self, names):
+        """Canonical spelling of every registered name in a column, other names unchanged"""
+        names = pd.Series(names)
+        fighters = self.lookup(names)
+        known = fighters >= 0
+        canonical = names.to_numpy(dtype=object, copy=True)
+        canonical[known] = np.array(self.names, dtype=object)[fighters[known]]
+        return pd.Series(canonical, index=names.index, dtype=names.dtype)
+
+    def fighter_ids(self, df):
+        """(red_ids, blue_ids, n_fighters) for the bouts in df, int32, unseen fighters get new ids, missing names -1"""
+        names = pd.concat([df['fighter_red'], df['fighter_blue']], ignore_index=True)
+        codes, uniques = pd.factorize(names)
+        lookup = np.array([self.add(name) for name in uniques] + [-1], dtype=np.int32) # code -1 (missing) takes the trailing -1
+        ids = lookup[codes]
+        n = df.shape[0]
+        return ids[:n], ids[n:], self.n_fighters
+
+    def copy(self):
+        new = FighterRegistry()
+        new.names = list(self.names)
+        new.ids = dict(self.ids)
+        return new
+
+    def save(self, path):
+        aliases = [(name, fighter) for name, fighter in self.ids.items() if self.names[fighter] != name]
+        rows = [(name, fighter) for fighter, name in enumerate(self.names)] + sorted(aliases, key=lambda a: a[1])
+        pd.DataFrame(rows, columns=['name', 'fighter_id']).to_csv(path, index=False)
+
+    @classmethod
+    def load(cls, path):
+        """Registry from a saved csv, rows of a fighter_id after the first one are its aliases"""
+        rows = pd.read_csv(path, keep_default_na=False)
+        registry = cls()
+        order = np.argsort(rows['fighter_id'].to_numpy(), kind='stable')
+        for name, fighter in zip(rows['name'].to_numpy()[order].tolist(), rows['fighter_id'].to_numpy()[order].tolist()):
+            if fighter == registry.n_fighters:
+                registry.add(name)
+            elif fighter < registry.n_fighters:
+                registry.add_alias(name, registry.names[fighter])
+            else:
+                raise ValueError(f'{path}: fighter ids must be dense, {fighter} comes after {registry.n_fighters - 1}')
+        return registry
+
+    @classmethod
+    def from_history(cls, stats_df, odds_df=None, min_score=0.9):
+        """
+        Registry of every fighter in the scraped stats history, in bout order (oldest first). With odds_df the
+        odds spellings that do not match a stats name are added as aliases when they score at least min_score.
+        """
+        stats = stats_df.iloc[::-1] # scraped newest first
+        names = np.column_stack([stats['fighter_red'].to_numpy(dtype=object), stats['fighter_blue'].to_numpy(dtype=object)]).ravel()
+        registry = cls(pd.unique(pd.Series(names).dropna()))
+        if odds_df is not None:
+            registry.add_aliases(pd.concat([odds_df['red_fighter'], odds_df['blue_fighter']]), min_score)
+        return registry
@@ -0,0 +1,201 @@
+import copy
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from FeatureEngineering.fighter_registry import FighterRegistry
+
+class FighterState:
+    """
+    End of history accumulators of every sequential feature engine, so new bouts can be applied
+    without replaying the whole history.
+
+    registry maps fighter names to dense integer ids (names/ids are its id -> name list and name -> id dict),
+    engines holds one dict of per fighter arrays (indexed by id) for each engine, last_date is the date of the last bout applied.
+    Pass a loaded FighterRegistry to keep the ids (and aliases) of the persisted registry.
+    """
+
+    def __init__(self, registry=None):
+        self.registry = FighterRegistry() if registry is None else registry
+        self.engines = {}
+        self.specs = {} # engine_state spec of every engine, to rebuild the arrays from snapshots
+        self.last_date = None
+        self.stats_columns = None # single event feature columns, used to lay out upcoming bouts
+
+    @property
+    def names(self):
+        return self.registry.names
+
+    @property
+    def ids(self):
+        return self.registry.ids
+
+    @property
+    def n_fighters(self):
+        return self.registry.n_fighters
+
+    def fighter_ids(self, df):
+        """(red_ids, blue_ids, n_fighters) for the bouts in df, unseen fighters get new ids"""
+        return self.registry.fighter_ids(df)
+
+    def copy(self):
+        """Independent copy, cheaper than a deepcopy since only the object arrays (sets) need per entry copies"""
+        new = copy.copy(self)
+        new.registry = self.registry.copy()
+        new.engines = {name: {key: copy_array(values) for key, values in arrays.items()}
+                       for name, arrays in self.engines.items()}
+        return new
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+def copy_array(values):
+    if values.dtype != object:
+        return values.copy()
+    copied = np.empty_like(values)
+    for idx, value in np.ndenumerate(values):
+        copied[idx] = copy.copy(value)
+    return copied
+
+def engine_state(state, name, n_fighters, spec):
+    """
+    Per fighter arrays of one engine, spec is {array name: (dtype, fill, trailing shape)}.
+    Without a state fresh arrays are returned, with a state the engine's stored arrays are returned
+    (grown to n_fighters for new fighters) and updating them in place updates the state.
+    A callable fill (e.g. set) builds one object per fighter.
+    """
+    arrays = {} if state is None else state.engines.setdefault(name, {})
+    if state is not None:
+        state.specs[name] = spec
+    for key, (dtype, fill, shape) in spec.items():
+        current = arrays.get(key)
+        have = 0 if current is None else len(current)
+        if have >= n_fighters:
+            continue
+        if callable(fill):
+            extra = np.empty((n_fighters - have,) + tuple(shape), dtype=object)
+            for idx in np.ndindex(extra.shape):
+                extra[idx] = fill()
+        else:
+            extra = np.full((n_fighters - have,) + tuple(shape), fill, dtype=dtype)
+        arrays[key] = extra if current is None else np.concatenate([current, extra])
+    return arrays
+
+SNAPSHOT_VERSION = 1
+
+class StateSnapshots:
+    """
+    FighterState checkpoints after every event date, for starting backtests from any point in history.
+
+    A checkpoint only stores the engine rows of the fighters that fought on that date (the rest of the
+    state is unchanged), so the history is one row per fighter appearance instead of one full state per date.
+    as_of(date) binary searches the checkpoint dates and takes each fighter's latest row up to that checkpoint.
+    """
+
+    def __init__(self):
+        self.dates = [] # checkpoint event dates, increasing
+        self.n_fighters = [] # number of fighter ids at each checkpoint, ids are assigned in order
+        self.names = []
+        self.aliases = {} # alias spelling -> fighter id, from the state's registry
+        self.specs = {}
+        self.stats_columns = None
+        self.record_checkpoint = [] # per checkpoint fighter rows, which checkpoint and which fighter
+        self.record_fighter = []
+        self.records = {} # (engine, array) -> list of per checkpoint row blocks
+
+    def checkpoint(self, state, date, fighter_names):
+        """Record the rows of fighter_names after the bouts on date were applied to state"""
+        date = pd.Timestamp(date)
+        if self.dates and date <= self.dates[-1]:
+            raise ValueError(f"checkpoint dates must increase, got {date} after {self.dates[-1]}")
+
+        fighters = np.unique([state.ids[name] for name in fighter_names])
+        self.dates.append(date)
+        self.n_fighters.append(state.n_fighters)
+        self.names = list(state.names)
+        if len(state.ids) > state.n_fighters:
+            self.aliases = {name: fighter for name, fighter in state.ids.items() if state.names[fighter] != name}
+        self.specs.update(state.specs)
+        self.stats_columns = state.stats_columns
+        self.record_checkpoint.append(np.full(len(fighters), len(self.dates) - 1, dtype=np.int32))
+        self.record_fighter.append(fighters.astype(np.int32))
+        for engine, arrays in state.engines.items():
+            for key, values in arrays.items():
+                if (engine, key) not in self.records:
+                    # engines that first appear after earlier checkpoints had their fill values there
+                    spec = {key: state.specs[engine][key]}
+                    self.records[engine, key] = [engine_state(None, engine, len(earlier), spec)[key]
+                                                 for earlier in self.record_fighter[:-1]]
+                self.records[engine, key].append(copy_array(values[fighters]))
+
+    def as_of(self, date):
+        """FighterState after every checkpoint on or before date, an empty state before the first one"""
+        dates = np.array(self.dates, dtype='datetime64[ns]')
+        k = np.searchsorted(dates, np.datetime64(pd.Timestamp(date), 'ns'), side='right') - 1
+        if k < 0:
+            return FighterState()
+
+        n_fighters = self.n_fighters[k]
+        registry = FighterRegistry(self.names[:n_fighters])
+        registry.ids.update({name: fighter for name, fighter in self.aliases.items() if fighter < n_fighters})
+        state = FighterState(registry)
+        state.last_date = self.dates[k]
+        state.stats_columns = self.stats_columns
+
+        record_checkpoint = np.concatenate(self.record_checkpoint)
+        record_fighter = np.concatenate(self.record_fighter)
+        end = np.searchsorted(record_checkpoint, k, side='right') # records are in checkpoint order
+        # latest record of each fighter up to checkpoint k
+        fighters, last = np.unique(record_fighter[:end][::-1], return_index=True)
+        rows = end - 1 - last
+
+        for (engine, key), blocks in self.records.items():
+            arrays = engine_state(state, engine, n_fighters, {key: self.specs[engine][key]})
+            arrays[key][fighters] = copy_array(np.concatenate(blocks)[rows])
+        return state
+
+    def save(self, path):
+        """One compressed .npz, per fighter rows stacked per engine array (object arrays like the mma_math sets are pickled)"""
+        arrays = {
+            'version': np.array(SNAPSHOT_VERSION),
+            'dates': np.array(self.dates, dtype='datetime64[ns]'),
+            'n_fighters': np.array(self.n_fighters, dtype=np.int64),
+            'names': np.array(self.names, dtype=object),
+            'alias_names': np.array(list(self.aliases), dtype=object),
+            'alias_ids': np.array(list(self.aliases.values()), dtype=np.int64),
+            'record_checkpoint': np.concatenate(self.record_checkpoint) if self.dates else np.empty(0, dtype=np.int32),
+            'record_fighter': np.concatenate(self.record_fighter) if self.dates else np.empty(0, dtype=np.int32),
+            'meta': np.frombuffer(pickle.dumps((self.specs, self.stats_columns, list(self.records))), dtype=np.uint8),
+        }
+        for i, blocks in enumerate(self.records.values()):
+            arrays[f'records_{i}'] = np.concatenate(blocks)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path, allow_pickle=True)
+        if int(data['version']) != SNAPSHOT_VERSION:
+            raise ValueError(f"snapshot format {int(data['version'])} can not be read by version {SNAPSHOT_VERSION}")
+
+        snapshots = cls()
+        snapshots.specs, snapshots.stats_columns, keys = pickle.loads(data['meta'].tobytes())
+        snapshots.dates = [pd.Timestamp(date) for date in data['dates']]
+        snapshots.n_fighters = data['n_fighters'].tolist()
+        snapshots.names = data['names'].tolist()
+        snapshots.aliases = dict(zip(data['alias_names'].tolist(), data['alias_ids'].tolist()))
+
+        # split the stacked records back into per checkpoint blocks
+        record_checkpoint = data['record_checkpoint']
+        bounds = np.searchsorted(record_checkpoint, np.arange(len(snapshots.dates) + 1))
+        snapshots.record_checkpoint = np.split(record_checkpoint, bounds[1:-1])
+        snapshots.record_fighter = np.split(data['record_fighter'], bounds[1:-1])
+        for i, key in enumerate(keys):
+            snapshots.records[key] = np.split(data[f'records_{i}'], bounds[1:-1])
+        return snapshots
\ No newline at end of file
@@ -0,0 +1,38 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError: # not available on windows
+    resource = None
+
+def compact_frame(df, categories=True, category_ratio=0.5):
+    """
+    Memory lean dtypes for a feature frame: float64 columns become float32 and with categories
+    string columns with few distinct values (fighter names, methods, weight classes, locations) become categoricals.
+    Columns where most values are distinct (urls etc.) stay strings since the categories would not save anything.
+    Categoricals of different columns do not compare with each other, so frames still going through the
+    feature engines (which match winner names against fighter names) should keep their strings.
+    All columns are converted by one astype so the result is a single consolidated frame.
+    """
+    df = df.infer_objects() # numeric columns left as object by concats with all NaN placeholder rows
+    dtypes = {}
+    for col in df.columns.unique():
+        values = df[col]
+        if isinstance(values, pd.DataFrame): # duplicate column names from merges
+            continue
+        if values.dtype == np.float64:
+            dtypes[col] = np.float32
+        elif categories and pd.api.types.infer_dtype(values, skipna=True) == 'string':
+            if values.nunique() <= category_ratio * len(values):
+                dtypes[col] = 'category'
+    return df.astype(dtypes) if dtypes else df
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, None where the resource module is missing"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10 # bytes on macOS, KB on linux
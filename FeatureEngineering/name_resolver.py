@@ -0,0 +1,157 @@
+import re
+import math
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+SAINT = re.compile(r'\bsaint\b')
+MIN_PREFIX = 3 # shortest token that matches longer tokens it starts (alex -> alexander)
+PREFIX_CREDIT = .8 # share of a token's weight a prefix match earns
+COMMON_SHARE = .01 # tokens in more than this share of names only score names found through rarer tokens
+
+def normalize_name(name):
+    """Name cleaning shared by the odds and stats names: lower case, hyphens to spaces, no dots or apostrophes, saint -> st"""
+    return SAINT.sub('st', name.lower().replace('-', ' ').replace('.', '').replace("'", ''))
+
+def normalize_names(col):
+    """normalize_name over a column, every distinct name is cleaned once, missing names stay missing"""
+    codes, uniques = pd.factorize(col)
+    cleaned = np.array([normalize_name(name) for name in uniques] + [np.nan], dtype=object)
+    return pd.Series(cleaned[codes], index=col.index, dtype=col.dtype) # code -1 (missing) takes the trailing NaN
+
+class NameResolver:
+    """
+    Fuzzy lookup of fighter names against a fixed list of known names, indexed once.
+    Known names are cleaned with normalize_name and split into tokens, and an inverted index maps every token
+    to the names containing it, so a query only looks at names sharing one of its tokens (or a token prefix)
+    instead of comparing against every known name.
+
+    Scores are idf weighted jaccard similarities of the token sets, rare tokens (surnames) count more than
+    common ones (first names). A token that only matches as a prefix of the other (alex / alexander) earns
+    PREFIX_CREDIT of its weight. Names equal after cleaning, or once the spaces are dropped (doo ho / dooho), score 1.
+    ids: canonical id of every known name (default its position), spellings of the same fighter can share an id.
+    """
+
+    def __init__(self, names, ids=None):
+        self.names = list(names)
+        self.ids = np.arange(len(self.names)) if ids is None else np.asarray(ids)
+        cleaned = [normalize_name(name) for name in self.names]
+        self.tokens = [frozenset(name.split()) for name in cleaned]
+
+        postings = defaultdict(list)
+        for row, tokens in enumerate(self.tokens):
+            for token in tokens:
+                postings[token].append(row)
+        self.index = {token: np.array(rows) for token, rows in postings.items()}
+        self.vocab = sorted(self.index)
+        n_names = max(len(self.names), 1)
+        self.common = max(COMMON_SHARE * n_names, 50)
+        self.unseen_weight = math.log(1 + n_names)
+        self.weights = {token: math.log(1 + n_names / len(rows)) for token, rows in self.index.items()}
+        self.name_weight = np.array([sum(self.weights[t] for t in tokens) for tokens in self.tokens])
+
+        # first spelling wins for exact lookups
+        self.exact = {}
+        self.joined = {}
+        for row, name in enumerate(cleaned):
+            self.exact.setdefault(name, row)
+            self.joined.setdefault(name.replace(' ', ''), row)
+
+    def token_matches(self, token):
+        """(known token, credit) pairs for a query token: itself, known tokens it starts and known tokens that start it"""
+        matches = [(token, 1.0)] if token in self.index else []
+        if len(token) >= MIN_PREFIX:
+            start = bisect_left(self.vocab, token)
+            while start < len(self.vocab) and self.vocab[start].startswith(token):
+                if self.vocab[start] != token:
+                    matches.append((self.vocab[start], PREFIX_CREDIT))
+                start += 1
+            matches += [(token[:k], PREFIX_CREDIT) for k in range(MIN_PREFIX, len(token)) if token[:k] in self.index]
+        return matches
+
+    def scores(self, name):
+        """{row: score} of every known name sharing a token or token prefix with name"""
+        cleaned = normalize_name(name)
+        exact = self.exact.get(cleaned, self.joined.get(cleaned.replace(' ', '')))
+        if exact is not None:
+            return {exact: 1.0}
+
+        query = set(cleaned.split())
+        matches = {token: self.token_matches(token) for token in query}
+        query_weight = sum(self.weights.get(token, self.unseen_weight) for token in query)
+
+        # exact token matches before prefix matches, rarest tokens first. A common token (first name) only adds
+        # to names found through rarer ones, and every token of a known name is matched by one query token at most
+        passes = []
+        for exact in (True, False):
+            for token in query:
+                token_matches = [(known, credit) for known, credit in matches[token] if (credit == 1.0) == exact]
+                postings = sum(len(self.index[known]) for known, _ in token_matches)
+                passes.append((not exact, postings, token, token_matches))
+        passes.sort(key=lambda p: p[:2])
+        shared = defaultdict(float)
+        used = defaultdict(set)
+        matched = defaultdict(set) # query tokens already scored per row
+        for _, _, token, token_matches in passes:
+            best = {}
+            for known, credit in token_matches:
+                rows = self.index[known].tolist()
+                if shared and len(rows) > self.common:
+                    rows = [row for row in rows if row in shared]
+                value = credit * min(self.weights.get(token, self.unseen_weight), self.weights[known])
+                for row in rows:
+                    if token not in matched[row] and known not in used[row] and value > best.get(row, (0.0,))[0]:
+                        best[row] = (value, known)
+            for row, (value, known) in best.items():
+                shared[row] += value
+                used[row].add(known)
+                matched[row].add(token)
+
+        return {row: value / (query_weight + self.name_weight[row] - value) for row, value in shared.items()}
+
+    def resolve(self, name, min_score=0.0):
+        """(canonical id, score) of the best scoring known name, (-1, 0.0) when nothing reaches min_score"""
+        if not isinstance(name, str):
+            return -1, 0.0
+        scores = self.scores(name)
+        if not scores:
+            return -1, 0.0
+        row = max(scores, key=lambda r: (scores[r], -r)) # ties go to the earlier known name
+        if scores[row] < min_score:
+            return -1, 0.0
+        return self.ids[row], scores[row]
+
+    def resolve_many(self, names, min_score=0.0):
+        """resolve over a column of names, every distinct name is resolved once, returns (ids, scores) arrays"""
+        codes, uniques = pd.factorize(pd.Series(names))
+        resolved = [self.resolve(name, min_score) for name in uniques] + [(-1, 0.0)]
+        ids = np.array([r[0] for r in resolved])
+        scores = np.array([r[1] for r in resolved])
+        return ids[codes], scores[codes]
+
+    def partial_matches(self, name):
+        """
+        Rows of the known names whose tokens all match a token of name, or that match every token of name,
+        in known name order. Token level version of the scrapers' two way partial match: tokens match when
+        equal or when one starts the other (alex / alexander, see token_matches).
+        """
+        query = frozenset(normalize_name(name).split())
+        if not query:
+            return []
+        postings = sorted((self.matched_rows(token) for token in query), key=len)
+        contains_query = set(postings[0])
+        for rows in postings[1:]:
+            contains_query.intersection_update(rows)
+        in_query = {row for rows in postings for row in rows
+                    if all(any(prefix_match(token, q) for q in query) for token in self.tokens[row])}
+        return sorted(contains_query | in_query)
+
+    def matched_rows(self, token):
+        """Rows of the known names with a token matching token, see token_matches"""
+        return {row for known, _ in self.token_matches(token) for row in self.index[known].tolist()}
+
+def prefix_match(a, b):
+    """Tokens that are equal, or where one starts the other and is MIN_PREFIX letters at least"""
+    return a == b or (min(len(a), len(b)) >= MIN_PREFIX and (a.startswith(b) or b.startswith(a)))
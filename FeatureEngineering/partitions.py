@@ -0,0 +1,80 @@
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from FeatureEngineering.feature_functions import bout_ids
+from FeatureEngineering.feature_registry import compute_features
+
+def fighter_components(red_ids, blue_ids, n_fighters):
+    """
+    Connected component label of every fighter in the graph where bouts are edges, the label is the
+    smallest fighter id of the component. Vectorized union find: every round hooks the larger root of
+    each bout onto the smaller one, then pointer jumping flattens the trees.
+    """
+    labels = np.arange(n_fighters)
+    red_ids = np.asarray(red_ids)
+    blue_ids = np.asarray(blue_ids)
+    while True:
+        red_root, blue_root = labels[red_ids], labels[blue_ids]
+        split = red_root != blue_root
+        if not split.any():
+            return labels
+        np.minimum.at(labels, np.maximum(red_root, blue_root)[split], np.minimum(red_root, blue_root)[split])
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+def bout_components(df, appearances=None):
+    """Component of each bout (dense, numbered by first bout), bouts in different components share no fighter history"""
+    red_ids, blue_ids, n_fighters = bout_ids(df, appearances)
+    labels = fighter_components(red_ids, blue_ids, n_fighters)
+    components, _ = pd.factorize(labels[red_ids])
+    return components
+
+def partition_bouts(components, n_parts):
+    """
+    Pack whole components into at most n_parts groups of similar bout counts (largest component first onto the
+    lightest group). Returns the row positions of each non empty group, in their original order.
+    """
+    sizes = np.bincount(components)
+    groups = [(0, part) for part in range(n_parts)]
+    assignment = np.empty(len(sizes), dtype=np.int64)
+    for component in np.argsort(-sizes, kind='stable'):
+        load, part = heapq.heappop(groups)
+        assignment[component] = part
+        heapq.heappush(groups, (load + sizes[component], part))
+
+    bout_part = assignment[components]
+    return [rows for rows in (np.flatnonzero(bout_part == part) for part in range(n_parts)) if len(rows)]
+
+def partition_features(args):
+    bouts, features = args
+    return compute_features(bouts, features)
+
+def partitioned_features(df_, features=None, n_jobs=2):
+    """
+    compute_features with the bout table split into independent fighter components, each group of components
+    runs the chronological engines in its own process and the rows are put back in df_'s order.
+    Same values as compute_features(df_, features) since no fighter appears in two groups.
+    """
+    parts = partition_bouts(bout_components(df_), n_jobs)
+    if len(parts) < 2:
+        return compute_features(df_, features)
+
+    with ProcessPoolExecutor(max_workers=len(parts)) as pool:
+        results = list(pool.map(partition_features, [(df_.iloc[rows], features) for rows in parts]))
+
+    rows = np.concatenate(parts)
+    merged = pd.concat(results, axis=0).iloc[np.argsort(rows, kind='stable')]
+    merged.index = df_.index
+    return merged
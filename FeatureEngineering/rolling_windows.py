@@ -0,0 +1,91 @@
+import numpy as np
+
+from FeatureEngineering.dates import day_numbers, day_floats
+from FeatureEngineering.fighter_state import engine_state
+
+def windowed_rolling_stats(per_fight_features, appearances, features, windows=(), half_lives=(), time_col='fight_minutes', state=None):
+    """
+    Pre fight stats over each fighter's last N fights and with exponential time decay, for every feature.
+    per_fight_features must be date sorted with {feature}_red/{feature}_blue per fight values, appearances
+    is its FighterAppearances table.
+
+    All window sizes share one ring buffer of the last max(windows) fights per fighter, each window keeps a
+    running sum that adds the new fight and drops the fight leaving that window, and each half life (days)
+    keeps a decayed sum that is scaled down by the days since the fighter's last fight before adding.
+    Every update is O(1) in the window length and the history is walked once for all windows.
+
+    Returns a dict of columns:
+        {feature}_last{N}_pm_{color}, {feature}_last{N}_avg_{color}: per minute and per fight over the last N fights
+        {feature}_hl{H}_pm_{color}, {feature}_hl{H}_avg_{color}: per minute and per fight, fights weighted 0.5**(days ago / H)
+    Debuts are NaN, NaN stats count as 0. With a FighterState the buffers resume from (and are left in) the state.
+    """
+    windows = np.asarray(sorted(windows), dtype=np.int64)
+    half_lives = np.asarray(sorted(half_lives), dtype=float)
+    if len(windows) == 0 and len(half_lives) == 0:
+        return {}
+
+    n_feat = len(features)
+    # one row per appearance, features then minutes
+    values = np.column_stack([appearances.stack(per_fight_features, feat) for feat in features] +
+                             [appearances.repeat(per_fight_features, time_col)])
+    values = np.nan_to_num(values)
+    days = np.repeat(day_floats(day_numbers(per_fight_features['date'])), 2)
+
+    n_fighters = appearances.n_fighters
+    max_window = int(windows.max()) if len(windows) else 1
+    arrays = engine_state(state, f'windowed_{list(windows)}_{list(half_lives)}', n_fighters, {
+        'ring': (float, 0.0, (max_window, n_feat + 1)),
+        'window_sums': (float, 0.0, (len(windows), n_feat + 1)),
+        'decay_sums': (float, 0.0, (len(half_lives), n_feat + 2)), # features, minutes, fights
+        'fight_count': (np.int64, 0, ()),
+        'last_day': (float, np.nan, ()),
+    })
+    ring, window_sums, decay_sums = arrays['ring'], arrays['window_sums'], arrays['decay_sums']
+    fight_count, last_day = arrays['fight_count'], arrays['last_day']
+
+    window_out = np.full((len(values), len(windows), n_feat + 1), np.nan)
+    window_fights = np.zeros((len(values), len(windows)))
+    decay_out = np.full((len(values), len(half_lives), n_feat + 2), np.nan)
+
+    for row, fighter in enumerate(appearances.fighter.tolist()):
+        count = fight_count[fighter]
+        x = values[row]
+
+        if count:
+            window_out[row] = window_sums[fighter]
+            window_fights[row] = np.minimum(windows, count)
+            decay_out[row] = decay_sums[fighter]
+
+        # window update, drop the fight that falls out of each window
+        leaving = np.where((count >= windows)[:, None], ring[fighter, (count - windows) % max_window], 0.0)
+        window_sums[fighter] += x - leaving
+        ring[fighter, count % max_window] = x
+
+        # decay update, the decay at query time cancels in the pm/avg ratios so sums are kept as of the last fight
+        if count:
+            factor = np.nan_to_num(0.5 ** ((days[row] - last_day[fighter]) / half_lives), nan=1.0)
+            decay_sums[fighter] *= factor[:, None]
+        decay_sums[fighter, :, :n_feat + 1] += x
+        decay_sums[fighter, :, n_feat + 1] += 1
+
+        fight_count[fighter] = count + 1
+        last_day[fighter] = days[row]
+
+    columns = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for j, feature in enumerate(features):
+            for w_idx, window in enumerate(windows):
+                sums = window_out[:, w_idx]
+                stats = {f'last{window}_pm': sums[:, j] / sums[:, n_feat],
+                         f'last{window}_avg': sums[:, j] / window_fights[:, w_idx]}
+                for name, stat in stats.items():
+                    columns[f'{feature}_{name}_red'], columns[f'{feature}_{name}_blue'] = appearances.unstack(stat)
+
+            for h_idx, half_life in enumerate(half_lives):
+                sums = decay_out[:, h_idx]
+                label = f'hl{half_life:g}'
+                stats = {f'{label}_pm': sums[:, j] / sums[:, n_feat],
+                         f'{label}_avg': sums[:, j] / sums[:, n_feat + 1]}
+                for name, stat in stats.items():
+                    columns[f'{feature}_{name}_red'], columns[f'{feature}_{name}_blue'] = appearances.unstack(stat)
+    return columns
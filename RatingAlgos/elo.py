@@ -1,51 +1,48 @@
-import numpy as np 
-import pandas as pd 
-from collections import defaultdict
-
-def elo_rating(df,k):
-    
-    elo_dic = defaultdict(list)
-    red_elo = []
-    blue_elo = []
-    for _, row in df.iterrows(): 
-        red_name = row['fighter_red']
-        blue_name = row['fighter_blue']
-
-        if red_name not in elo_dic:
-            elo_dic[red_name] = [1500]
-        
-        if blue_name not in elo_dic:
-            elo_dic[blue_name] = [1500]
-
-        prev_blue = elo_dic[blue_name][-1] #elo pre fight
-        prev_red = elo_dic[red_name][-1]
-        red_elo.append(prev_red)
-        blue_elo.append(prev_blue)
-        
-        if row['winner'] == 1 and pd.notna(row['winner']):
-
-            d = prev_red - prev_blue
-            mu = 1 / (1 + 10**(-d/400))
-            red_new = prev_red + k * (1-mu) #red wins
-
-            d = prev_blue - prev_red
-            mu = 1 / (1 + 10**(-d/400))
-            blue_new = prev_blue + k * (0-mu) #blue loses
-            
-            elo_dic[red_name].append(red_new)
-            elo_dic[blue_name].append(blue_new)
-
-        if row['winner'] == 0 and pd.notna(row['winner']):
-
-            d = prev_blue - prev_red
-            mu = 1 / (1 + 10**(-d/400))
-            blue_new = prev_blue + k * (1-mu) #blue wins
-
-            d = prev_red - prev_blue
-            mu = 1 / (1 + 10**(-d/400))
-            red_new = prev_red + k * (0-mu) #red loses
-            
-            elo_dic[red_name].append(red_new)
-            elo_dic[blue_name].append(blue_new)
-
-    return np.column_stack([red_elo, blue_elo])
\ No newline at end of file
+import numpy as np
+
+from FeatureEngineering.feature_functions import bout_ids, method_flags
+from FeatureEngineering.fighter_state import engine_state
+from FeatureEngineering.kernels import elo_kernel
+
+def elo_state_name(k, corner_advantage, mov):
+    name = 'elo_k' + '_'.join(f'{x:g}' for x in k.ravel())
+    if corner_advantage.any():
+        name += '_adv' + '_'.join(f'{x:g}' for x in corner_advantage.ravel())
+    if mov.any():
+        name += '_mov' + '_'.join(f'{x:g}' for x in mov.ravel())
+    return name
+
+def elo_sweep(df, k, corner_advantage=0.0, mov=0.0, appearances=None, state=None):
+    """
+    Pre fight elo of every configuration in one chronological pass, fighters start at 1500 and draws/no
+    contests leave ratings unchanged.
+    k, corner_advantage and mov are scalars or arrays broadcast against each other, one configuration per entry:
+    corner_advantage is added to the red corner's rating in the expected score (the red corner is usually the
+    favourite), mov scales the update of a finish (KO/TKO or submission) by 1 + mov, decisions keep k.
+    The ratings of all configurations are one (fighters, configurations) array updated by elo_kernel (compiled
+    loop, or a dependency level of bouts at a time with numpy), so sweeping 50 k values costs about one run.
+    Returns (bouts, 2) pre fight (red, blue) elo for scalar settings, (bouts, 2, configurations) otherwise.
+    With a FighterState the ratings resume from the stored ratings of the same settings.
+    """
+    k, corner_advantage, mov = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (k, corner_advantage, mov)))
+    red_ids, blue_ids, n_fighters = bout_ids(df, appearances, state)
+    elo = engine_state(state, elo_state_name(k, corner_advantage, mov), n_fighters,
+                       {'elo': (float, 1500.0, k.shape)})['elo']
+    elo = elo.reshape(n_fighters, -1) # a view, updates reach the state
+    scalar = k.ndim == 0
+    k, corner_advantage, mov = k.ravel(), corner_advantage.ravel(), mov.ravel()
+
+    winner = df['winner'].to_numpy(dtype=float)
+    if mov.any():
+        _, _, is_ko, is_sub = method_flags(df)
+        finish = (is_ko | is_sub).astype(float)
+    else:
+        finish = np.zeros(df.shape[0])
+
+    out = elo_kernel(red_ids, blue_ids, winner, finish, k, corner_advantage, mov, elo)
+    return out[:, :, 0] if scalar else out
+
+def elo_rating(df, k, appearances=None, state=None, corner_advantage=0.0, mov=0.0):
+    """Pre fight elo per corner with one k, see elo_sweep. Ratings are kept in an array indexed by fighter id,
+    with a FighterState they resume from the stored ratings."""
+    return elo_sweep(df, float(k), corner_advantage, mov, appearances, state)
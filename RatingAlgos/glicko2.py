@@ -1,4 +1,15 @@
-import numpy as np 
+# http://www.glicko.net/glicko/glicko2.pdf
+
+import numpy as np
+
+from FeatureEngineering.dates import day_numbers, day_floats
+from FeatureEngineering.feature_functions import bout_ids
+from FeatureEngineering.fighter_state import engine_state
+
+# Constants for Glicko-2
+TAU = 0.3       # System constant, usually 0.3-1.2
+EPSILON = 1e-6  # Convergence tolerance
+SCALE = 173.7178
 
 # g(phi) function
 def g(phi):
@@ -10,11 +21,11 @@ def E(mu, mu_j, phi_j):
 
 # Convert rating to Glicko-2 scale
 def scale_down(rating):
-    return (rating - 1500) / 173.7178
+    return (rating - 1500) / SCALE
 
 # Convert rating back to original scale
 def scale_up(mu):
-    return 173.7178 * mu + 1500
+    return SCALE * mu + 1500
 
 def compute_v(mu, mu_j_list, phi_j_list):
     summation = 0
@@ -31,100 +42,157 @@ def compute_delta(mu, mu_j_list, phi_j_list, outcomes):
         summation += g(phi_j) * (s - e)
     return v * summation
 
-def update_sigma(mu, phi, sigma, mu_j_list, phi_j_list, outcomes):
+def f(x, delta, phi, v, a, tau=TAU):
+    exp_x = np.exp(x)
+    num = exp_x * (delta**2 - phi**2 - v - exp_x)
+    denom = 2 * (phi**2 + v + exp_x)**2
+    return num / denom - (x - a) / (tau**2)
+
+def update_sigma(mu, phi, sigma, mu_j_list, phi_j_list, outcomes, tau=TAU):
+    """New volatility of one player, Illinois iteration of step 5 in the Glicko-2 paper"""
     delta = compute_delta(mu, mu_j_list, phi_j_list, outcomes)
     v = compute_v(mu, mu_j_list, phi_j_list)
-    
+
     a = np.log(sigma**2)
     A = a
-    B = None
     if delta**2 > phi**2 + v:
         B = np.log(delta**2 - phi**2 - v)
     else:
         k = 1
-        while f(a - k*TAU, delta, phi, v, a) < 0:
+        while f(a - k*tau, delta, phi, v, a, tau) < 0:
             k += 1
-        B = a - k*TAU
+        B = a - k*tau
 
-    f_B = lambda x: f(x, delta, phi, v, a)
-    
-    # Newton-Raphson iteration
-    f_A = lambda x: f(x, delta, phi, v, a)
+    f_A = f(A, delta, phi, v, a, tau)
+    f_B = f(B, delta, phi, v, a, tau)
     while abs(B - A) > EPSILON:
-        C = A + (A - B) * f_A(A) / (f_B(B) - f_A(A))
-        f_C = f(C, delta, phi, v, a)
-        if f_C * f_B(B) < 0:
-            A = B
-            f_A = f_B
+        C = A + (A - B) * f_A / (f_B - f_A)
+        f_C = f(C, delta, phi, v, a, tau)
+        if f_C * f_B <= 0:
+            A, f_A = B, f_B
         else:
-            f_A = lambda x: f_A(x)/2
-        B = C
-        f_B = f_C
-    sigma_prime = np.exp(A/2)
-    return sigma_prime
-
-def f(x, delta, phi, v, a):
-    exp_x = np.exp(x)
-    num = exp_x * (delta**2 - phi**2 - v - exp_x)
-    denom = 2 * (phi**2 + v + exp_x)**2
-    return num / denom - (x - a) / (TAU**2)
+            f_A = f_A / 2
+        B, f_B = C, f_C
+    return np.exp(A/2)
 
 def update_rating(mu, phi, sigma_prime, mu_j_list, phi_j_list, outcomes):
     v = compute_v(mu, mu_j_list, phi_j_list)
     delta = compute_delta(mu, mu_j_list, phi_j_list, outcomes)
-    
+
     phi_star = np.sqrt(phi**2 + sigma_prime**2)
     phi_prime = 1 / np.sqrt(1/phi_star**2 + 1/v)
-    
+
     # Use delta instead of recomputing summation
     mu_prime = mu + (phi_prime**2 / v) * delta
-    
-    return mu_prime, phi_prime
 
+    return mu_prime, phi_prime
 
-# Constants for Glicko-2
-TAU = 0.3       # System constant, usually 0.3-1.2
-EPSILON = 1e-6  # Convergence tolerance
-
-rating = 1500
-rd = 320
-sigma = 0.06
-
-# Opponents
-opponent_ratings = [1400, 1550, 1700]
-opponent_rds = [30, 100, 300]
-outcomes = [1, 0, 1]  # 1 = win, 0 = loss
-
-# Scale down
-mu = scale_down(rating)
-phi = rd / 173.7178
-mu_j_list = [scale_down(r) for r in opponent_ratings]
-phi_j_list = [r/173.7178 for r in opponent_rds]
-
-
-
-player_sigma = sigma 
-mu = (player_rating - 1500) / 173.7178
-phi = player_rd / 173.7178
-
-
-sigma = player_sigma
-for match in matches:
-    opp_rating = match['opponent_rating']
-    opp_rd = match['opponent_rd']
-    outcome = match['outcome']  # 1, 0, or 0.5
-    
-    mu_j = (opp_rating - 1500) / 173.7178
-    phi_j = opp_rd / 173.7178
-    
-    # Update volatility (sigma)
-    sigma = update_sigma(mu, phi, sigma, [mu_j], [phi_j], [outcome])
-    
-    # Update rating and RD
-    mu, phi = update_rating(mu, phi, sigma, [mu_j], [phi_j], [outcome])
-    
-    # Optional: convert back to original scale for logging
-    player_rating = mu * 173.7178 + 1500
-    player_rd = phi * 173.7178
-    
-    print(f"After match vs {opp_rating}, new rating: {player_rating:.1f}, RD: {player_rd:.1f}")
\ No newline at end of file
+def solve_volatility(delta, phi, sigma, v, tau=TAU, max_iter=100):
+    """
+    update_sigma for arrays of players at once, every player whose bracket has not converged takes one
+    Illinois step per iteration so the loop runs as often as the slowest player needs, not once per player.
+    """
+    a = np.log(sigma**2)
+    rest = delta**2 - phi**2 - v
+
+    def f_rows(x, rows):
+        exp_x = np.exp(x)
+        return exp_x * (rest[rows] - exp_x) / (2 * (phi[rows]**2 + v[rows] + exp_x)**2) - (x - a[rows]) / tau**2
+
+    A = a.copy()
+    B = np.log(np.where(rest > 0, rest, 1.0))
+    # no root above a, step down from a until f changes sign
+    below = np.flatnonzero(rest <= 0)
+    k = np.ones(len(below))
+    stepping = np.arange(len(below))
+    while len(stepping):
+        rows = below[stepping]
+        stepping = stepping[f_rows(a[rows] - k[stepping] * tau, rows) < 0]
+        k[stepping] += 1
+    B[below] = a[below] - k * tau
+
+    all_rows = np.arange(len(a))
+    f_A, f_B = f_rows(A, all_rows), f_rows(B, all_rows)
+    rows = np.flatnonzero(np.abs(B - A) > EPSILON)
+    for _ in range(max_iter):
+        if not len(rows):
+            break
+        C = A[rows] + (A[rows] - B[rows]) * f_A[rows] / (f_B[rows] - f_A[rows])
+        f_C = f_rows(C, rows)
+        swap = f_C * f_B[rows] <= 0
+        A[rows] = np.where(swap, B[rows], A[rows])
+        f_A[rows] = np.where(swap, f_B[rows], f_A[rows] / 2)
+        B[rows], f_B[rows] = C, f_C
+        rows = rows[np.abs(B[rows] - A[rows]) > EPSILON]
+    return np.exp(A / 2)
+
+def glicko2_state_name(tau, period_days, initial_rd, initial_sigma):
+    name = f'glicko2_tau{tau:g}_rd{initial_rd:g}_sigma{initial_sigma:g}'
+    if period_days is not None:
+        name += f'_period{period_days:g}'
+    return name
+
+def glicko2_rating(df, appearances=None, state=None, tau=TAU, period_days=None, initial_rd=350, initial_sigma=0.06):
+    """
+    Pre fight Glicko-2 rating, RD and volatility per corner, with the bouts of each event date as one rating period.
+    Every fighter of a period is updated from the ratings before the period (a fighter with two bouts on
+    one date has both results in one update) and the volatilities of all of them are solved together
+    (solve_volatility). Draws/no contests and upcoming bouts record pre fight values but update nothing.
+    period_days: with a length in days, a fighter's RD also grows by sigma for every rating period of that length
+    they sat out since their last bout, None only applies the growth of the period they fight in.
+    With a FighterState the ratings resume from the stored ratings of the same settings (glicko2_state_name).
+    Returns columns (rating red, rating blue, rd red, rd blue, volatility red, volatility blue) on the 1500 scale.
+    """
+    red_ids, blue_ids, n_fighters = bout_ids(df, appearances, state)
+    arrays = engine_state(state, glicko2_state_name(tau, period_days, initial_rd, initial_sigma), n_fighters, {
+        'mu': (float, 0.0, ()),
+        'phi': (float, initial_rd / SCALE, ()),
+        'sigma': (float, initial_sigma, ()),
+        'last_day': (float, np.nan, ()), # day number of the last bout
+    })
+    mu, phi, sigma, last_day = arrays['mu'], arrays['phi'], arrays['sigma'], arrays['last_day']
+
+    n = df.shape[0]
+    days = day_numbers(df['date'])
+    day_values = day_floats(days)
+    red_won = df['winner'].eq(1).to_numpy()
+    decided = df['winner'].isin([0, 1]).to_numpy()
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    ends = np.r_[starts[1:], n]
+
+    out = np.empty((n, 6))
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        red, blue = red_ids[start:end], blue_ids[start:end]
+        out[start:end] = np.column_stack([mu[red], mu[blue], phi[red], phi[blue], sigma[red], sigma[blue]])
+
+        rows = decided[start:end]
+        if not rows.any():
+            continue
+        fighter = np.concatenate([red[rows], blue[rows]])
+        opponent = np.concatenate([blue[rows], red[rows]])
+        red_score = red_won[start:end][rows].astype(float)
+        score = np.concatenate([red_score, 1 - red_score])
+        players, player = np.unique(fighter, return_inverse=True)
+
+        player_phi = phi[players]
+        if period_days is not None: # periods sat out since the last bout
+            missed = np.nan_to_num((day_values[start] - last_day[players]) / period_days - 1)
+            player_phi = np.minimum(np.sqrt(player_phi**2 + np.maximum(missed, 0) * sigma[players]**2), initial_rd / SCALE)
+
+        g_j = g(phi[opponent])
+        e_j = E(mu[fighter], mu[opponent], phi[opponent])
+        v = 1 / np.bincount(player, g_j**2 * e_j * (1 - e_j), minlength=len(players))
+        improvement = np.bincount(player, g_j * (score - e_j), minlength=len(players))
+        delta = v * improvement
+
+        new_sigma = solve_volatility(delta, player_phi, sigma[players], v, tau)
+        phi_star = np.sqrt(player_phi**2 + new_sigma**2)
+        new_phi = 1 / np.sqrt(1 / phi_star**2 + 1 / v)
+        mu[players] = mu[players] + new_phi**2 * improvement
+        phi[players] = new_phi
+        sigma[players] = new_sigma
+        last_day[players] = day_values[start]
+
+    out[:, :2] = scale_up(out[:, :2])
+    out[:, 2:4] *= SCALE
+    return out
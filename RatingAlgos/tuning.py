@@ -0,0 +1,210 @@
+"""
+Hyperparameter search for the rating engines (elo, glicko, glicko2), scored on chronologically held out bouts.
+
+    python RatingAlgos/tuning.py
+    python RatingAlgos/tuning.py --engines elo glicko --holdout 0.2 --n-jobs 4 --save
+
+Every configuration replays the whole history, ratings before a bout never see its result, and is scored by the
+log loss (and Brier score) of its pre fight win probabilities on the decided bouts of the last holdout share of
+the history. Candidates are drawn from SEARCH_SPACE in random order and evaluated a round at a time in a
+process pool, the search of an engine stops once patience rounds in a row did not improve its best log loss.
+--save writes the best settings of every engine to RATING_PARAMS_FILE, which the feature registry loads over
+its RATING_PARAMS defaults, so non_rolling_stats builds the rating columns with them.
+"""
+import sys
+import os
+import json
+import glob
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+
+from FeatureEngineering.dates import day_numbers, to_datetime
+from FeatureEngineering.feature_functions import fighter_ids, method_flags
+from FeatureEngineering.feature_registry import RATING_PARAMS, RATING_PARAMS_FILE
+from RatingAlgos.elo import elo_sweep
+from RatingAlgos.glicko import glicko_rating
+from RatingAlgos.glicko2 import glicko2_rating, scale_down, E, SCALE
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# engine -> setting -> candidate values, every combination is a candidate configuration
+SEARCH_SPACE = {
+    'elo': {
+        'k': list(range(8, 81, 4)),
+        'corner_advantage': [0.0, 10.0, 25.0, 50.0],
+        'mov': [0.0, 0.25, 0.5, 1.0],
+    },
+    'glicko': {
+        'c': [10, 20, 34, 50, 75, 100, 150],
+        'period_days': [None, 30, 90, 180, 365],
+        'initial_rd': [200, 250, 300, 350, 400],
+    },
+    'glicko2': {
+        'tau': [0.2, 0.3, 0.5, 0.75, 1.0, 1.2],
+        'period_days': [None, 30, 90, 180, 365],
+        'initial_rd': [250, 350],
+        'initial_sigma': [0.03, 0.06, 0.1],
+    },
+}
+
+def bout_index(df):
+    """
+    Compact bout table the engines replay, built once per search: int fighter ids, winner (1 red, 0 blue,
+    2 draw/no contest), event date and a KO/DEC method flag for the finish multiplier of elo.
+    df is a date sorted bout table (fighter_red, fighter_blue, winner, date, method), bouts without a result are dropped.
+    """
+    df = df[df['winner'].notna()]
+    red, blue, _ = fighter_ids(df)
+    _, _, is_ko, is_sub = method_flags(df)
+    winner = df['winner'].to_numpy(dtype=float)
+    return pd.DataFrame({
+        'fighter_red': red,
+        'fighter_blue': blue,
+        'winner': np.where(np.isin(winner, [0, 1]), winner, 2).astype(np.int8),
+        'date': to_datetime(day_numbers(df['date'])),
+        'method': np.where(is_ko | is_sub, 'KO', 'DEC'),
+    })
+
+def holdout_rows(index, holdout=0.2):
+    """Decided bouts from the event date the last holdout share of the bouts starts on, whole events stay together"""
+    dates = index['date'].to_numpy()
+    start = dates[min(int(len(dates) * (1 - holdout)), len(dates) - 1)]
+    return (dates >= start) & index['winner'].isin([0, 1]).to_numpy()
+
+def candidates(space, seed=0):
+    """Every combination of a search space as config dicts, in random order"""
+    names = list(space)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+    order = np.random.default_rng(seed).permutation(len(configs))
+    return [configs[i] for i in order]
+
+def scores(p, red_won):
+    """(log loss, Brier score) of red win probabilities"""
+    p = np.clip(p, 1e-12, 1 - 1e-12)
+    log_loss = -np.mean(red_won * np.log(p) + (1 - red_won) * np.log(1 - p))
+    return float(log_loss), float(np.mean((p - red_won)**2))
+
+def glicko_probability(values):
+    """Red win probability from pre fight glicko ratings and RDs, both RDs widen the expectation"""
+    q = np.log(10) / 400
+    g = 1 / np.sqrt(1 + 3 * q**2 * (values[:, 2]**2 + values[:, 3]**2) / np.pi**2)
+    return 1 / (1 + 10**(-g * (values[:, 0] - values[:, 1]) / 400))
+
+def glicko2_probability(values):
+    return E(scale_down(values[:, 0]), scale_down(values[:, 1]), np.sqrt(values[:, 2]**2 + values[:, 3]**2) / SCALE)
+
+# bout index and holdout rows of the pool workers, set once per worker by init_worker
+worker_data = {}
+
+def init_worker(index, rows):
+    worker_data['index'] = index
+    worker_data['rows'] = rows
+
+def evaluate(engine, configs):
+    """Scored copies of configs on the worker's bout index, elo configs share one elo_sweep pass"""
+    index, rows = worker_data['index'], worker_data['rows']
+    red_won = index['winner'].to_numpy()[rows] == 1
+    if engine == 'elo':
+        settings = {name: np.array([config[name] for config in configs], dtype=float) for name in configs[0]}
+        values = elo_sweep(index, **settings)[rows]
+        p = 1 / (1 + 10**(-(values[:, 0] - values[:, 1] + settings.get('corner_advantage', 0.0)) / 400))
+        return [dict(config, **dict(zip(['log_loss', 'brier'], scores(p[:, i], red_won)))) for i, config in enumerate(configs)]
+
+    results = []
+    for config in configs:
+        if engine == 'glicko':
+            p = glicko_probability(glicko_rating(index, **config)[rows])
+        else:
+            p = glicko2_probability(glicko2_rating(index, **config)[rows])
+        results.append(dict(config, **dict(zip(['log_loss', 'brier'], scores(p, red_won)))))
+    return results
+
+def search(df, engines=None, space=SEARCH_SPACE, holdout=0.2, n_jobs=1, round_size=16, patience=3, min_delta=1e-4, seed=0):
+    """
+    Random search over space for every engine, returns {engine: scored configs, best log loss first}.
+    A round is round_size candidates split over the n_jobs workers (elo rounds are one task per worker since
+    elo_sweep scores a whole batch in one pass). An engine stops after patience rounds without improving its
+    best log loss by min_delta, or when its candidates run out.
+    """
+    engines = list(space) if engines is None else engines
+    index = bout_index(df)
+    rows = holdout_rows(index, holdout)
+
+    pool = ProcessPoolExecutor(max_workers=n_jobs, initializer=init_worker, initargs=(index, rows)) if n_jobs > 1 else None
+    if pool is None:
+        init_worker(index, rows)
+    results = {}
+    try:
+        for engine in engines:
+            pending = candidates(space[engine], seed)
+            scored, best, stale = [], np.inf, 0
+            while pending and stale < patience:
+                batch, pending = pending[:round_size], pending[round_size:]
+                tasks = [batch[i::n_jobs] for i in range(n_jobs) if batch[i::n_jobs]]
+                if pool is None:
+                    round_results = [evaluate(engine, task) for task in tasks]
+                else:
+                    round_results = list(pool.map(evaluate, [engine] * len(tasks), tasks))
+                scored += [result for task_results in round_results for result in task_results]
+
+                round_best = min(result['log_loss'] for result in scored)
+                stale = 0 if round_best < best - min_delta else stale + 1
+                best = min(best, round_best)
+            results[engine] = sorted(scored, key=lambda result: result['log_loss'])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return results
+
+def best_params(results):
+    """{engine: settings} of the best scoring configuration of every engine"""
+    return {engine: {name: value for name, value in scored[0].items() if name not in ('log_loss', 'brier')}
+            for engine, scored in results.items() if scored}
+
+def save_params(params, path=RATING_PARAMS_FILE):
+    """Write searched settings for the feature registry, engines not searched keep what the file had"""
+    saved = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            saved = json.load(f)
+    for engine, settings in params.items():
+        saved[engine] = {name: value.item() if isinstance(value, np.generic) else value for name, value in settings.items()}
+    with open(path, 'w') as f:
+        json.dump(saved, f, indent=1)
+
+def report(results, top=5):
+    for engine, scored in results.items():
+        current = {name: value for name, value in RATING_PARAMS.get(engine, {}).items()}
+        print(f'{engine}: {len(scored)} configurations, current settings {current}')
+        print(pd.DataFrame(scored[:top]).to_string(index=False))
+
+def shipped_bouts():
+    """Date sorted bout table of the shipped stats history"""
+    from FeatureEngineering.ufc_features import single_event_features, apply_rolling_stats
+    stats = pd.read_csv(sorted(glob.glob(os.path.join(ROOT, 'data', 'stats_history_*.csv')))[-1])
+    return apply_rolling_stats(single_event_features(stats.loc[:, ~stats.columns.str.contains('^Unnamed')]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engines', nargs='*', choices=list(SEARCH_SPACE), help='engines to search, default all')
+    parser.add_argument('--holdout', type=float, default=0.2, help='share of the most recent bouts scored')
+    parser.add_argument('--n-jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--round-size', type=int, default=16, help='candidates per round')
+    parser.add_argument('--patience', type=int, default=3, help='rounds without improvement before an engine stops')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', action='store_true', help=f'write the best settings to {RATING_PARAMS_FILE}')
+    args = parser.parse_args()
+
+    results = search(shipped_bouts(), args.engines, holdout=args.holdout, n_jobs=args.n_jobs,
+                     round_size=args.round_size, patience=args.patience, seed=args.seed)
+    report(results)
+    if args.save:
+        save_params(best_params(results))
+        print(f'best settings written to {RATING_PARAMS_FILE}')
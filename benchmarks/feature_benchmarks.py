@@ -0,0 +1,230 @@
+"""
+Wall time and peak memory of the feature engines at several history sizes, appended to a JSON history so
+runs on different commits can be compared.
+
+    python benchmarks/feature_benchmarks.py
+    python benchmarks/feature_benchmarks.py --sizes 10000 100000 --only elo glicko
+
+Runs offline: the shipped history (data/stats_history_*.csv, data/odds_history_*.csv) is benchmarked as is,
+larger histories come from the synthetic league generator (benchmarks/synthetic_league.py), which writes the
+same raw scraper strings every stage parses in production.
+Each benchmark runs in a forked child process, peak memory is the child's peak RSS above what it inherited.
+"""
+import sys
+import os
+import glob
+import json
+import time
+import argparse
+import platform
+import subprocess
+import multiprocessing as mp
+from datetime import datetime, timezone
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+
+from FeatureEngineering import feature_functions as ff
+from FeatureEngineering.memory import peak_rss_mb
+from FeatureEngineering.ufc_features import single_event_features, apply_rolling_stats, non_rolling_stats
+from FeatureEngineering.odds_features import build_odds_features
+from RatingAlgos.elo import elo_rating, elo_sweep
+from RatingAlgos.glicko import glicko_rating
+from RatingAlgos.glicko2 import glicko2_rating
+from benchmarks.synthetic_league import synthetic_league
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATA_DIR = os.path.join(ROOT, 'data')
+HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_history.json')
+SIZES = [10_000, 100_000, 1_000_000]
+
+def latest_csv(prefix):
+    return sorted(glob.glob(os.path.join(DATA_DIR, f'{prefix}_*.csv')))[-1]
+
+def shipped_history():
+    """Scraped stats history and odds history shipped in data/, as the pipeline reads them"""
+    stats = pd.read_csv(latest_csv('stats_history'))
+    odds = pd.read_csv(latest_csv('odds_history'))
+    return stats.loc[:, ~stats.columns.str.contains('^Unnamed')], odds.loc[:, ~odds.columns.str.contains('^Unnamed')]
+
+def stage_inputs(raw, odds, seed=0):
+    """
+    (stage, frame) for every stage in pipeline order: odds rows, scraped rows, single event features, rolling
+    stats and the date sorted bout table the engines read. Each frame is dropped once the next one is built
+    so the large histories only hold one or two stages in memory.
+    """
+    yield 'odds', odds
+    yield 'raw', raw
+    single = single_event_features(raw)
+    del raw
+    yield 'single', single
+    rolling = apply_rolling_stats(single)
+    del single
+    yield 'rolling', rolling
+    # the engines run on the rolling table merged with the odds (opening prices resampled, the shipped odds
+    # rows do not line up with the stats rows), kd totals under the names total_knockdowns reads
+    prices = odds[['open_red', 'open_blue']].iloc[np.random.default_rng(seed).integers(0, len(odds), len(rolling))]
+    yield 'bouts', rolling.assign(red_kd=rolling['kd_total_red'], blue_kd=rolling['kd_total_blue'],
+                                  open_red=prices['open_red'].to_numpy(), open_blue=prices['open_blue'].to_numpy())
+
+# name -> (input stage, function of that input)
+BENCHMARKS = {
+    'single_event_features': ('raw', single_event_features),
+    'apply_rolling_stats': ('single', apply_rolling_stats),
+    'non_rolling_stats': ('rolling', non_rolling_stats),
+    'build_odds_features': ('odds', build_odds_features),
+    'elo_rating': ('bouts', lambda df: elo_rating(df, 32)),
+    'elo_sweep': ('bouts', lambda df: elo_sweep(df, np.linspace(8, 64, 50))),
+    'glicko_rating': ('bouts', glicko_rating),
+    'glicko2_rating': ('bouts', glicko2_rating),
+    'fighter_ids': ('bouts', ff.fighter_ids),
+    'method_flags': ('bouts', ff.method_flags),
+    'fighter_history': ('bouts', ff.fighter_history),
+    'months_since_last': ('bouts', ff.months_since_last),
+    'mma_math': ('bouts', ff.mma_math),
+    'count_fav_dog': ('bouts', ff.count_fav_dog),
+    'odds_counters': ('bouts', lambda df: ff.odds_counters(df, ['open'])), # the bout table only carries opening prices
+    'ratio_features': ('bouts', ff.ratio_features),
+    'td_ratio': ('bouts', ff.td_ratio),
+    'sig_strikes_ratio': ('bouts', ff.sig_strikes_ratio),
+    'control_pr_ratio': ('bouts', ff.control_pr_ratio),
+    'total_knockdowns': ('bouts', ff.total_knockdowns),
+    'total_bonus': ('bouts', ff.total_bonus),
+    'win_lose_streak': ('bouts', ff.win_lose_streak),
+    'womens_fight': ('bouts', ff.womens_fight),
+    'method_wins': ('bouts', ff.method_wins),
+    'method_win_pct': ('bouts', ff.method_win_pct),
+    'avg_fight_time': ('bouts', ff.avg_fight_time),
+}
+
+def timed_run(func, df):
+    """(seconds, peak MB above the starting RSS) of func(df)"""
+    start_rss = peak_rss_mb()
+    start = time.perf_counter()
+    func(df)
+    seconds = time.perf_counter() - start
+    peak = peak_rss_mb()
+    return seconds, None if peak is None else peak - start_rss
+
+def child_run(conn, func, df):
+    try:
+        conn.send(timed_run(func, df))
+    except Exception as e:
+        conn.send(e)
+    finally:
+        conn.close()
+
+def run_benchmark(func, df):
+    """
+    Runs func(df) in a forked child so its peak RSS starts from the inherited inputs and no earlier benchmark,
+    falls back to the current process (no memory figure) where fork is not available.
+    """
+    if 'fork' not in mp.get_all_start_methods():
+        return timed_run(func, df)[0], None
+    ctx = mp.get_context('fork')
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=child_run, args=(child_conn, func, df))
+    process.start()
+    child_conn.close()
+    try:
+        result = parent_conn.recv()
+    except EOFError: # killed, usually out of memory
+        process.join()
+        result = RuntimeError(f'benchmark process exited with code {process.exitcode}')
+    process.join()
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+def previous_results(history):
+    """Latest recorded (seconds, peak_mb) per (benchmark, data, bouts)"""
+    previous = {}
+    for run in history:
+        for result in run['results']:
+            previous[(result['benchmark'], result['data'], result['bouts'])] = result
+    return previous
+
+def main(sizes=SIZES, only=None, shipped=True, repeat=1, history_file=HISTORY_FILE, seed=0):
+    names = [name for name in BENCHMARKS if only is None or name in only]
+    stats, odds = shipped_history()
+    datasets = [('shipped', stats, odds)] if shipped else []
+    datasets += [('synthetic', n_bouts, None) for n_bouts in sizes]
+
+    history = load_history(history_file)
+    previous = previous_results(history)
+    results = []
+
+    print(f"{'benchmark':<24} {'data':>10} {'bouts':>10} {'seconds':>10} {'peak MB':>9} {'vs last':>8}")
+    for data, raw, data_odds in datasets:
+        if data == 'synthetic':
+            raw, data_odds = synthetic_league(raw, seed)
+        n_bouts = len(raw)
+        stages_left = {BENCHMARKS[name][0] for name in names}
+
+        for stage, df in stage_inputs(raw, data_odds, seed):
+            if stage == 'raw':
+                del raw # the stage generator holds the only reference until single event features are built
+            for name in (name for name in names if BENCHMARKS[name][0] == stage):
+                result = {'benchmark': name, 'data': data, 'bouts': n_bouts}
+                try:
+                    runs = [run_benchmark(BENCHMARKS[name][1], df) for _ in range(repeat)]
+                except Exception as e:
+                    result['error'] = repr(e)
+                    results.append(result)
+                    print(f'{name:<24} {data:>10} {n_bouts:>10} failed: {e!r}')
+                    continue
+
+                seconds = min(run[0] for run in runs)
+                peak = None if runs[0][1] is None else max(run[1] for run in runs)
+                result.update(seconds=round(seconds, 4), peak_mb=None if peak is None else round(peak, 1))
+                results.append(result)
+
+                last = previous.get((name, data, n_bouts))
+                change = f"{seconds / last['seconds']:>7.2f}x" if last and last.get('seconds') else f"{'':>8}"
+                peak_str = f'{peak:>9.1f}' if peak is not None else f"{'-':>9}"
+                print(f'{name:<24} {data:>10} {n_bouts:>10} {seconds:>10.3f} {peak_str} {change}')
+            del df
+            stages_left.discard(stage)
+            if not stages_left: # later stages are only inputs of benchmarks that were not selected
+                break
+
+    history.append({
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'repeat': repeat,
+        'results': results,
+    })
+    with open(history_file, 'w') as f:
+        json.dump(history, f, indent=1)
+    print(f'results appended to {history_file}')
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='*', default=SIZES, help='synthetic history sizes (bouts)')
+    parser.add_argument('--only', nargs='*', choices=list(BENCHMARKS), help='benchmarks to run, default all')
+    parser.add_argument('--no-shipped', action='store_true', help='skip the shipped history')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per benchmark, the fastest is recorded')
+    parser.add_argument('--history', default=HISTORY_FILE, help='JSON file the run is appended to')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    main(args.sizes, args.only, not args.no_shipped, args.repeat, args.history, args.seed)
@@ -0,0 +1,103 @@
+"""
+Parity and runtime of the sequential kernels (FeatureEngineering/kernels.py) on every available backend.
+
+    python benchmarks/kernel_benchmarks.py
+    python benchmarks/kernel_benchmarks.py --bouts 1000000 --parity-bouts 50000
+
+Every backend's output and final per fighter state is compared to the python reference loop on --parity-bouts
+random bouts (the check fails with a non zero exit code), then each backend is timed on --bouts bouts.
+The numba timings exclude compilation, which happens on the warm up run (and is cached on disk afterwards).
+"""
+import sys
+import os
+import time
+import argparse
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from FeatureEngineering import kernels
+from benchmarks.random_bouts import random_pairings
+
+TOLERANCE = 1e-9
+
+def random_bouts(n_bouts, seed=0):
+    """random_pairings with event days in order and a finish flag on half the bouts"""
+    red, blue, winner, n_fighters = random_pairings(n_bouts, seed)
+    rng = np.random.default_rng(seed + 1)
+    days = np.sort(rng.integers(0, max(n_bouts // 12, 1), n_bouts)).astype(float)
+    finish = (rng.random(n_bouts) < 0.5).astype(float)
+    return red, blue, winner.astype(float), days, finish, n_fighters
+
+def kernel_runs(bouts):
+    """name -> function running the kernel on fresh state arrays, returning (output, *final state arrays)"""
+    red, blue, winner, days, finish, n_fighters = bouts
+    k = np.linspace(8, 64, 8)
+
+    def elo():
+        ratings = np.full((n_fighters, len(k)), 1500.0)
+        return kernels.elo_kernel(red, blue, winner, finish, k, np.full(len(k), 25.0), np.full(len(k), 0.5), ratings), ratings
+
+    def glicko():
+        state = [np.full(n_fighters, 1500.0), np.full(n_fighters, 350.0), np.zeros(n_fighters, dtype=bool),
+                 np.full(n_fighters, np.nan)]
+        return (kernels.glicko_kernel(red, blue, winner == 1, days, 90, 34, 350, *state, ~np.isnan(winner)), *state)
+
+    def streaks():
+        state = [np.zeros(n_fighters, dtype=np.int64) for _ in range(4)]
+        return (kernels.streak_kernel(red, blue, winner, *state), *state)
+
+    return {'elo': elo, 'glicko': glicko, 'streaks': streaks}
+
+def parity(n_bouts, backends, seed=0):
+    """{(kernel, backend): largest absolute difference to the python reference over the output and state}"""
+    runs = kernel_runs(random_bouts(n_bouts, seed))
+    kernels.set_backend('python')
+    reference = {name: run() for name, run in runs.items()}
+    diffs = {}
+    for backend in backends:
+        kernels.set_backend(backend)
+        for name, run in runs.items():
+            result = run()
+            diffs[(name, backend)] = max(float(np.max(np.abs(np.asarray(a, dtype=float) - np.asarray(b, dtype=float)), initial=0))
+                                         for a, b in zip(result, reference[name]))
+    kernels.set_backend(None)
+    return diffs
+
+def timings(n_bouts, backends, seed=0):
+    """{(kernel, backend): seconds}, after one warm up run on a small history"""
+    warm_up = kernel_runs(random_bouts(1000, seed))
+    runs = kernel_runs(random_bouts(n_bouts, seed))
+    seconds = {}
+    for backend in backends:
+        kernels.set_backend(backend)
+        for name, run in runs.items():
+            warm_up[name]()
+            start = time.perf_counter()
+            run()
+            seconds[(name, backend)] = time.perf_counter() - start
+    kernels.set_backend(None)
+    return seconds
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bouts', type=int, default=1_000_000, help='bouts of the timed runs')
+    parser.add_argument('--parity-bouts', type=int, default=50_000, help='bouts of the parity check')
+    parser.add_argument('--backends', nargs='*', choices=kernels.BACKENDS, help='default every installed backend but python')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    backends = args.backends or [b for b in kernels.BACKENDS if b != 'python' and (b != 'numba' or kernels.numba is not None)]
+    print(f'default backend: {kernels.backend()}')
+    diffs = parity(args.parity_bouts, backends, args.seed)
+    seconds = timings(args.bouts, backends, args.seed)
+    print(f"{'kernel':<10} {'backend':<8} {'max diff':>10} {'seconds':>9}")
+    for name, backend in diffs:
+        print(f'{name:<10} {backend:<8} {diffs[(name, backend)]:>10.2e} {seconds[(name, backend)]:>9.3f}')
+    failed = [key for key, diff in diffs.items() if not diff <= TOLERANCE]
+    if failed:
+        print(f'parity failed for {failed}')
+        sys.exit(1)
+    print(f'all backends match the python reference within {TOLERANCE:g}')
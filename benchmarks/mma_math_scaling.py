@@ -0,0 +1,64 @@
+"""
+Runtime of mma_math against bout count, incremental opponent index vs the old quadratic rescan.
+
+    python benchmarks/mma_math_scaling.py
+"""
+import sys
+import os
+import time
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np 
+from collections import defaultdict
+
+from FeatureEngineering.feature_functions import mma_math
+from benchmarks.random_bouts import random_bouts
+
+def mma_math_rescan(df):
+    """Previous implementation, slices every earlier row for each bout (O(n^2))"""
+    fighter_dic_wins = defaultdict(set)
+    fighter_dic_losses = defaultdict(set)
+    mma_math_red = []
+    mma_math_blue = []
+
+    for idx, row in df.iterrows(): 
+        previous_fights = df.iloc[:idx]
+        for fighter in (row['fighter_red'], row['fighter_blue']):
+            history = previous_fights[(previous_fights['fighter_red'] == fighter) | 
+                                      (previous_fights['fighter_blue'] == fighter)].tail(1)
+            if history.empty:
+                continue
+            history = history.iloc[0]
+            if history['fighter_red'] == fighter and history['winner'] == 1:
+                fighter_dic_wins[fighter].add(history['fighter_blue'])
+            if history['fighter_blue'] == fighter and history['winner'] == 0:
+                fighter_dic_wins[fighter].add(history['fighter_red'])
+            if history['fighter_red'] == fighter and history['winner'] == 0:
+                fighter_dic_losses[fighter].add(history['fighter_blue'])
+            if history['fighter_blue'] == fighter and history['winner'] == 1:
+                fighter_dic_losses[fighter].add(history['fighter_red'])
+
+        mma_math_red.append(1 if fighter_dic_wins[row['fighter_red']] & fighter_dic_losses[row['fighter_blue']] else 0)
+        mma_math_blue.append(1 if fighter_dic_wins[row['fighter_blue']] & fighter_dic_losses[row['fighter_red']] else 0)
+    return np.column_stack([mma_math_red, mma_math_blue])
+
+def timed(func, df):
+    start = time.perf_counter()
+    out = func(df)
+    return out, time.perf_counter() - start
+
+if __name__ == "__main__":
+    bout_counts = [1_000, 2_000, 4_000, 8_000, 16_000, 100_000, 1_000_000]
+    max_rescan = 8_000 # the quadratic version takes minutes past this
+
+    print(f"{'bouts':>10} {'incremental (s)':>16} {'rescan (s)':>12}")
+    for n_bouts in bout_counts:
+        df = random_bouts(n_bouts)
+        new, new_time = timed(mma_math, df)
+        rescan_time = np.nan
+        if n_bouts <= max_rescan:
+            old, rescan_time = timed(mma_math_rescan, df)
+            assert np.array_equal(new, old), f'mma_math mismatch at {n_bouts} bouts'
+        print(f"{n_bouts:>10} {new_time:>16.3f} {rescan_time:>12.3f}")
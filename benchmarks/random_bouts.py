@@ -0,0 +1,22 @@
+"""Random bout histories for the scaling and kernel benchmarks, fighter pairings only (no per fight stats)"""
+import numpy as np
+import pandas as pd
+
+def random_pairings(n_bouts, seed=0):
+    """
+    (red ids, blue ids, winner, n_fighters) of random pairings from a fighter pool that grows with the history,
+    ~8 bouts per fighter, winner 1 red, 0 blue, 2 draw/no contest (2%)
+    """
+    rng = np.random.default_rng(seed)
+    n_fighters = max(n_bouts // 4, 2)
+    red = rng.integers(0, n_fighters, n_bouts)
+    blue = (red + rng.integers(1, n_fighters, n_bouts)) % n_fighters
+    winner = rng.choice([1, 0, 2], size=n_bouts, p=[0.6, 0.38, 0.02])
+    return red, blue, winner, n_fighters
+
+def random_bouts(n_bouts, seed=0):
+    """random_pairings as a bout table with fighter names"""
+    red, blue, winner, _ = random_pairings(n_bouts, seed)
+    return pd.DataFrame({'fighter_red': [f'fighter {i}' for i in red],
+                         'fighter_blue': [f'fighter {i}' for i in blue],
+                         'winner': winner})
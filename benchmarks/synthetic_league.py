@@ -0,0 +1,416 @@
+"""
+Synthetic league in the raw scraper schema, for checking the pipeline at production plus scale without scraping.
+
+    python benchmarks/synthetic_league.py --bouts 1000000 --out-dir /tmp/league
+
+Fighters get a weight class, a body, a style and a latent skill (elo points) that drifts bout to bout: a random
+walk plus early career improvement and a decline past 33. Every fighter's career is a list of bout slots a few
+months apart, slots of the same weight class are sorted by event and skill and paired with their neighbour,
+so bouts are matched within a weight class between fighters of similar level. The red corner wins with the
+elo expectation 1 / (1 + 10**(-(skill_red - skill_blue) / 400)), which is the model elo_rating and glicko_rating fit.
+Per fight stats follow each fighter's style, skill edge and fight length, and are written as the scraper writes
+them ('68 of 121', '53%', '3:30', '---' with no attempts). Odds rows come from a noisy, vigged market view of the
+same expectation, some with the +-1 day date offsets and name spellings the odds merge has to reconcile.
+Everything is vectorized and seeded, a million bouts take about 20 seconds and the same seed gives the same league.
+"""
+import sys
+import os
+import time
+import argparse
+from functools import lru_cache
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+
+# weight class -> (share of fighters, mean height in inches)
+WEIGHT_CLASSES = {
+    'Lightweight': (.170, 70), 'Welterweight': (.164, 71.5), 'Middleweight': (.131, 73), 'Featherweight': (.103, 69),
+    'Bantamweight': (.094, 67.5), 'Light Heavyweight': (.088, 74.5), 'Heavyweight': (.081, 75.5), 'Flyweight': (.049, 66),
+    "Women's Strawweight": (.044, 63), "Women's Flyweight": (.033, 65), "Women's Bantamweight": (.029, 66.5),
+    'Catch Weight': (.010, 70), "Women's Featherweight": (.004, 67),
+}
+FIRST_NAMES = ['Alex', 'Andre', 'Anthony', 'Brandon', 'Bruno', 'Carlos', 'Chris', 'Daniel', 'Derek', 'Diego', 'Dominick',
+               'Eddie', 'Gabriel', 'Ian', 'Islam', 'Jamie', 'Jose', 'Justin', 'Kamaru', 'Khalil', 'Marcus', 'Mateusz',
+               'Michael', 'Paulo', 'Rafael', 'Sean', 'Tatsuro', 'Tony', 'Umar', 'Zhang',
+               'AJ', 'CJ', 'JJ', 'TJ'] # initials, the odds site writes some of them A.J. etc.
+WOMEN_FIRST_NAMES = ['Amanda', 'Angela', 'Alexa', 'Brogan', 'Carla', 'Cynthia', 'Erin', 'Felicia', 'Gillian', 'Holly',
+                     'Irene', 'Jessica', 'Jennifer', 'Joanna', 'Julianna', 'Karolina', 'Katlyn', 'Lina', 'Mackenzie',
+                     'Maycee', 'Manon', 'Miesha', 'Molly', 'Natalia', 'Norma', 'Raquel', 'Rose', 'Tatiana', 'Tracy',
+                     'Valentina', 'Virna', 'Weili', 'Xiaonan', 'Yan'] # as many as FIRST_NAMES, names stay distinct
+SURNAME_SYLLABLES = ['ba', 'da', 'ka', 'ma', 'ra', 'sa', 'to', 'vo', 'lo', 'no', 'ri', 'vi', 'ki', 'ne', 'le', 'go',
+                     'zu', 'mu', 'ch', 'rez', 'vic', 'son', 'ski', 'ova']
+LOCATIONS = np.array([' Las Vegas, Nevada, USA', ' Abu Dhabi, Abu Dhabi, United Arab Emirates',
+                      ' London, England, United Kingdom', ' Newark, New Jersey, USA', ' Houston, Texas, USA',
+                      ' Anaheim, California, USA', ' Chicago, Illinois, USA', ' Montreal, Quebec, Canada',
+                      ' Rio de Janeiro, Rio de Janeiro, Brazil', ' Sydney, New South Wales, Australia',
+                      ' Paris, Ile-de-France, France', ' Mexico City, Distrito Federal, Mexico'], dtype=object)
+LOCATION_SHARES = [.44, .06, .05, .05, .05, .05, .05, .05, .05, .05, .05, .05]
+STANCES = np.array(['Orthodox', 'Southpaw', 'Switch', 'Open Stance'], dtype=object)
+KO_METHODS = np.array(['KO/TKO, Punches', 'KO/TKO, Punch', 'KO/TKO, Kick', 'KO/TKO', 'KO/TKO, Elbows', 'KO/TKO, Knee'], dtype=object)
+KO_SHARES = [.38, .36, .08, .06, .07, .05]
+SUB_METHODS = np.array(['SUB, Rear Naked Choke', 'SUB, Guillotine Choke', 'SUB, Armbar', 'SUB, Arm Triangle',
+                        'SUB, Triangle Choke', "SUB, D'Arce Choke"], dtype=object)
+SUB_SHARES = [.46, .21, .13, .09, .07, .04]
+DEC_METHODS = np.array(['U-DEC', 'S-DEC', 'M-DEC'], dtype=object)
+DEC_SHARES = [.77, .21, .02]
+
+MIN_GAP_DAYS = 35 # shortest turnaround between two bouts of a fighter
+MAX_WAIT_DAYS = 28 # slots further apart than this are not paired into one bout
+
+def surnames(count):
+    """The first count surnames of the syllable combinations, two syllables then three then four"""
+    names = []
+    for length in (2, 3, 4):
+        combos = np.array([''], dtype=object)
+        for _ in range(length):
+            combos = (combos[:, None] + np.array(SURNAME_SYLLABLES, dtype=object)[None, :]).ravel()
+        names.extend(combos[:count - len(names)].tolist())
+        if len(names) >= count:
+            break
+    return [name.capitalize() for name in names]
+
+def fighter_names(n_fighters, women, rng):
+    """
+    Distinct 'First Surname' per fighter. Fighter i takes slot (i * step) mod space of the first name x surname grid,
+    a bijection for step coprime to the space, so names are unique without materializing the grid.
+    About one in ten gets a hyphenated double surname.
+    """
+    n_first = len(FIRST_NAMES)
+    n_surnames = -(-n_fighters // n_first) + 1
+    last = np.array(surnames(n_surnames), dtype=object)
+    space = n_first * n_surnames
+    step = next(s for s in range(int(space * 0.618), 0, -1) if np.gcd(s, space) == 1)
+    cell = (np.arange(n_fighters, dtype=np.int64) * step) % space
+    first = np.array(FIRST_NAMES, dtype=object)[cell % n_first]
+    first[women] = np.array(WOMEN_FIRST_NAMES, dtype=object)[cell[women] % n_first]
+    surname = last[cell // n_first]
+    double = rng.random(n_fighters) < .1
+    surname[double] = surname[double] + '-' + last[rng.integers(0, n_surnames, double.sum())]
+    return first + ' ' + surname
+
+def odds_spelling(names):
+    """Spelling the odds site uses: A.J. for AJ and spaces for hyphens, both undone by the merge's name cleaning"""
+    spelled = pd.Series(names, dtype=object).str.replace('-', ' ', regex=False)
+    return spelled.str.replace(r'^([A-Z])([A-Z]) ', r'\1.\2. ', regex=True).to_numpy(dtype=object)
+
+@lru_cache(maxsize=None)
+def landed_of_table(top):
+    return np.array([f'{l} of {a}' for a in range(top) for l in range(a + 1)], dtype=object)
+
+def landed_of(landed, attempted):
+    """'68 of 121' strings, looked up in a table of every landed/attempted pair (attempts rounded up to a power of 2)"""
+    top = 1 << int(attempted.max() if len(attempted) else 0).bit_length()
+    return landed_of_table(top)[attempted * (attempted + 1) // 2 + landed]
+
+def percent(landed, attempted):
+    """'53%' (floored, as the scraper writes it), '---' with no attempts"""
+    table = np.array([f'{p}%' for p in range(101)] + ['---'], dtype=object)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = np.where(attempted > 0, 100 * landed // np.maximum(attempted, 1), 101)
+    return table[pct]
+
+def clock(seconds):
+    """'3:30' strings from whole seconds"""
+    table = np.array([f'{s // 60}:{s % 60:02d}' for s in range(int(seconds.max()) + 1 if len(seconds) else 1)], dtype=object)
+    return table[seconds]
+
+def group_cumsum(values, starts, counts):
+    """Cumulative sum restarting at every group, groups are contiguous runs given by their starts and lengths"""
+    totals = np.cumsum(values)
+    return totals - np.repeat(totals[starts] - values[starts], counts)
+
+def league_fighters(n_fighters, n_days, bouts_per_fighter, rng):
+    """Per fighter attributes, careers may start before the window (those fighters enter it with a history)"""
+    classes = list(WEIGHT_CLASSES)
+    shares = np.array([WEIGHT_CLASSES[c][0] for c in classes])
+    weight_class = rng.choice(len(classes), n_fighters, p=shares / shares.sum())
+    women = np.char.startswith(np.array(classes)[weight_class], 'Women')
+    height = np.round(np.array([WEIGHT_CLASSES[c][1] for c in classes])[weight_class] + rng.normal(0, 2, n_fighters)).astype(np.int64)
+    return {
+        'name': fighter_names(n_fighters, women, rng),
+        'weight_class': weight_class,
+        'debut': rng.integers(-2 * 365, n_days, n_fighters),
+        'debut_age': rng.uniform(21, 32, n_fighters),
+        'n_slots': rng.geometric(1 / bouts_per_fighter, n_fighters),
+        'skill': rng.normal(1500, 150, n_fighters),
+        'height': height,
+        'reach': height + np.round(rng.normal(1.5, 2.5, n_fighters)).astype(np.int64),
+        'stance': rng.choice(len(STANCES), n_fighters, p=[.75, .2, .04, .01]),
+        # style: significant strikes thrown per minute, accuracy, takedowns tried per minute and their accuracy
+        'strike_rate': rng.lognormal(np.log(8.5), .35, n_fighters),
+        'accuracy': rng.beta(9, 11, n_fighters),
+        'td_rate': rng.lognormal(np.log(.15), .8, n_fighters),
+        'td_accuracy': rng.beta(4, 6, n_fighters),
+        'pre_record': np.column_stack([rng.poisson(8, n_fighters), rng.poisson(2.5, n_fighters),
+                                       rng.binomial(2, .05, n_fighters)]),
+    }
+
+def match_bouts(fighters, n_days, spacing, rng):
+    """
+    Career slots of every fighter paired into bouts, returns (red slot fighter, blue slot fighter, day, skills) per bout.
+    Slots of one weight class are sorted by event and a noisy view of skill and neighbours fight each other, so
+    skill drives matchmaking within a card without every bout being an even match. Slots left without a partner
+    within MAX_WAIT_DAYS are dropped.
+    """
+    n_slots = fighters['n_slots']
+    starts = np.concatenate([[0], np.cumsum(n_slots)[:-1]])
+    fighter = np.repeat(np.arange(len(n_slots)), n_slots)
+    bout_number = np.arange(len(fighter)) - np.repeat(starts, n_slots)
+
+    gaps = MIN_GAP_DAYS + 2 * spacing + rng.gamma(2, 80, len(fighter))
+    gaps[starts] = 0
+    day = fighters['debut'][fighter] + np.round(group_cumsum(gaps, starts, n_slots)).astype(np.int64)
+    age = fighters['debut_age'][fighter] + (day - fighters['debut'][fighter]) / 365.25
+    skill = (fighters['skill'][fighter] + 60 * (1 - np.exp(-bout_number / 4)) - 25 * np.maximum(age - 33, 0)
+             + group_cumsum(rng.normal(0, 20, len(fighter)), starts, n_slots))
+
+    keep = (day >= 0) & (day < n_days)
+    fighter, day, skill = fighter[keep], day[keep], skill[keep]
+    weight_class = fighters['weight_class'][fighter]
+    event = day // spacing
+
+    order = np.lexsort((skill + rng.normal(0, 120, len(skill)), event, weight_class))
+    same_class_next = np.zeros(len(order), dtype=bool)
+    same_class_next[:-1] = weight_class[order[:-1]] == weight_class[order[1:]]
+    class_start = np.flatnonzero(np.concatenate([[True], ~same_class_next[:-1]]))
+    rank = np.arange(len(order)) - np.repeat(class_start, np.diff(np.concatenate([class_start, [len(order)]])))
+    first = np.flatnonzero((rank % 2 == 0) & same_class_next)
+    a, b = order[first], order[first + 1]
+    ok = (fighter[a] != fighter[b]) & (np.abs(day[a] - day[b]) <= MAX_WAIT_DAYS)
+    a, b = a[ok], b[ok]
+
+    bout_day = np.maximum(day[a], day[b]) // spacing * spacing
+    return fighter[a], fighter[b], bout_day, skill[a], skill[b]
+
+def american(prob):
+    """Win probability (with vig) to american odds"""
+    prob = np.clip(prob, .01, .99)
+    return np.round(np.where(prob >= .5, -100 * prob / (1 - prob), 100 * (1 - prob) / prob)).astype(np.int64)
+
+def market_odds(p_red, rng, vig=.045):
+    """Opening and two closing lines, a noisy market view of p_red that the closing lines move closer to"""
+    logit = np.log(p_red / (1 - p_red))
+    view = logit + rng.normal(0, .35, len(p_red))
+    lines = {}
+    for line, weight in (('open', 0), ('close1', .5), ('close2', .6)):
+        market = 1 / (1 + np.exp(-(view * (1 - weight) + logit * weight + rng.normal(0, .1, len(p_red)))))
+        lines[f'{line}_red'] = american(market * (1 + vig))
+        lines[f'{line}_blue'] = american((1 - market) * (1 + vig))
+    return lines
+
+def synthetic_league(n_bouts, seed=0, start='1994-01-01', years=30, bouts_per_fighter=8, bouts_per_event=12,
+                     odds_coverage=.97, date_shift_rate=.1, name_variant_rate=.3, truth=False):
+    """
+    n_bouts scraped bouts over `years` years from `start`, newest event first like the scraper writes them,
+    and the odds history rows of the bouts (odds_coverage of them) in the odds history schema.
+    Events are spaced so a card has about bouts_per_event bouts, or held daily once that needs more than one a day.
+    truth=True also returns the latent skills and the red win probability per stats row.
+    """
+    rng = np.random.default_rng(seed)
+    n_days = int(years * 365.25)
+    spacing = max(1, int(n_days * bouts_per_event // max(n_bouts, 1)))
+
+    # careers are cut by the window and unpaired slots are dropped, so the fighter count is scaled until enough bouts come out
+    n_fighters = int(2.6 * n_bouts / bouts_per_fighter) + 10
+    while True:
+        fighters = league_fighters(n_fighters, n_days, bouts_per_fighter, rng)
+        red, blue, day, red_skill, blue_skill = match_bouts(fighters, n_days, spacing, rng)
+        if len(red) >= n_bouts:
+            break
+        n_fighters = int(n_fighters * 1.1 * n_bouts / max(len(red), 1)) + 10
+
+    keep = np.sort(rng.choice(len(red), n_bouts, replace=False))
+    red, blue, day, red_skill, blue_skill = red[keep], blue[keep], day[keep], red_skill[keep], blue_skill[keep]
+
+    # the better fighter usually gets the red corner
+    swap = (red_skill < blue_skill) ^ (rng.random(n_bouts) < .2)
+    red, blue = np.where(swap, blue, red), np.where(swap, red, blue)
+    red_skill, blue_skill = np.where(swap, blue_skill, red_skill), np.where(swap, red_skill, blue_skill)
+    title = rng.random(n_bouts) < .05
+
+    # scraper order from here on: newest event first, and within a card title fights then the best matched bouts on top
+    order = np.lexsort((-(red_skill + blue_skill), ~title, -day))
+    red, blue, day, red_skill, blue_skill, title = red[order], blue[order], day[order], red_skill[order], blue_skill[order], title[order]
+    p_red = 1 / (1 + 10 ** (-(red_skill - blue_skill) / 400))
+
+    # --- RESULT ---
+    n = n_bouts
+    outcome = rng.random(n)
+    draw, no_contest = outcome < .007, (outcome >= .007) & (outcome < .012)
+    red_won = ~draw & ~no_contest & (rng.random(n) < p_red)
+    blue_won = ~draw & ~no_contest & ~red_won
+
+    finish_draw = rng.random(n)
+    ko = (red_won | blue_won) & (finish_draw < .32)
+    sub = (red_won | blue_won) & (finish_draw >= .32) & (finish_draw < .49)
+    cnc = no_contest & (rng.random(n) < .4)
+    finished = ko | sub | cnc
+    rounds = np.where(title, 5, 3)
+    finish_round = np.where(title, rng.choice(5, n, p=[.45, .25, .15, .08, .07]), rng.choice(3, n, p=[.55, .3, .15])) + 1
+    fight_round = np.where(finished, finish_round, rounds)
+    round_seconds = np.where(finished, rng.integers(5, 300, n), 300)
+    minutes = (fight_round - 1) * 5 + round_seconds / 60
+
+    method = rng.choice(DEC_METHODS, n, p=DEC_SHARES)
+    method[draw] = rng.choice(DEC_METHODS[1:], draw.sum())
+    method[ko] = rng.choice(KO_METHODS, ko.sum(), p=KO_SHARES)
+    method[sub] = rng.choice(SUB_METHODS, sub.sum(), p=SUB_SHARES)
+    method[no_contest] = np.where(cnc[no_contest], 'CNC', 'Overturned')
+
+    names = fighters['name']
+    winner = np.where(red_won, names[red], np.where(blue_won, names[blue], np.where(draw, 'DRAW', 'NC')))
+
+    # --- PER FIGHT STATS --- winner's output up, loser's down, accuracy moves with the skill edge
+    won = {'red': red_won, 'blue': blue_won}
+    lost = {'red': blue_won, 'blue': red_won}
+    ids = {'red': red, 'blue': blue}
+    edge = {'red': (red_skill - blue_skill) / 400, 'blue': (blue_skill - red_skill) / 400}
+    stats = {}
+    for color in ['red', 'blue']:
+        f = ids[color]
+        pace = np.where(won[color], 1.15, np.where(lost[color], .9, 1.0))
+        sig_att = rng.poisson(fighters['strike_rate'][f] * pace * minutes)
+        accuracy = np.clip(fighters['accuracy'][f] + .08 * np.tanh(edge[color]) + .03 * (pace - 1), .1, .9)
+        sig_landed = rng.binomial(sig_att, accuracy)
+        td_att = rng.poisson(fighters['td_rate'][f] * pace * minutes)
+        td_landed = rng.binomial(td_att, np.clip(fighters['td_accuracy'][f] + .1 * np.tanh(edge[color]), .05, .95))
+        ctrl = np.minimum(np.round(td_landed * rng.gamma(2, 50, n)).astype(np.int64), np.round(minutes * 60).astype(np.int64))
+
+        # target and position splits of the significant strikes, misses follow the same split with more head shots
+        misses = sig_att - sig_landed
+        head_l, head_m = rng.binomial(sig_landed, .62), rng.binomial(misses, .8)
+        body_l = rng.binomial(sig_landed - head_l, .55)
+        body_m = rng.binomial(misses - head_m, .55)
+        ground_share = np.clip(ctrl / np.maximum(minutes * 60, 1), 0, .9)
+        ground_l, ground_m = rng.binomial(sig_landed, ground_share), rng.binomial(misses, ground_share)
+        clinch_l = rng.binomial(sig_landed - ground_l, .12)
+        clinch_m = rng.binomial(misses - ground_m, .12)
+        extra_att = rng.poisson(1.5 * minutes + 20 * ground_share * minutes)
+        extra_landed = rng.binomial(extra_att, .75)
+
+        stats.update({
+            f'kd_{color}': rng.poisson(.03 * minutes * np.exp(edge[color])) + (ko & won[color]) * rng.binomial(1, .45, n),
+            f'sig_str_{color}': (sig_landed, sig_att),
+            f'td_{color}': (td_landed, td_att),
+            f'clinch_{color}': (clinch_l, clinch_l + clinch_m),
+            f'ground_{color}': (ground_l, ground_l + ground_m),
+            f'sub_att_{color}': rng.poisson(.04 * fighters['td_rate'][f] / .15 * minutes) + (sub & won[color]),
+            f'rev_{color}': rng.poisson(.01 * minutes),
+            f'ctrl_{color}': ctrl,
+            f'head_{color}': (head_l, head_l + head_m),
+            f'body_{color}': (body_l, body_l + body_m),
+            f'leg_{color}': (sig_landed - head_l - body_l, sig_att - head_l - head_m - body_l - body_m),
+            f'distance_{color}': (sig_landed - ground_l - clinch_l, sig_att - ground_l - ground_m - clinch_l - clinch_m),
+            f'total_strikes_{color}': (sig_landed + extra_landed, sig_att + extra_att),
+        })
+
+    # --- FIGHTER PROFILES --- records are the scrape time record: pre UFC record plus every bout in the league
+    n_fighters = len(names)
+    wins = np.bincount(red[red_won], minlength=n_fighters) + np.bincount(blue[blue_won], minlength=n_fighters)
+    losses = np.bincount(red[blue_won], minlength=n_fighters) + np.bincount(blue[red_won], minlength=n_fighters)
+    draws = np.bincount(red[draw], minlength=n_fighters) + np.bincount(blue[draw], minlength=n_fighters)
+    pre = fighters['pre_record']
+    record = np.array([f'{w}-{l}-{d}' for w, l, d in zip((pre[:, 0] + wins).tolist(), (pre[:, 1] + losses).tolist(),
+                                                       (pre[:, 2] + draws).tolist())], dtype=object)
+
+    start_day = np.datetime64(start, 'D')
+    birth = start_day + (fighters['debut'] - np.round(fighters['debut_age'] * 365.25)).astype(np.int64)
+    birth_days, birth_idx = np.unique(birth, return_inverse=True)
+    dob = pd.DatetimeIndex(birth_days).strftime('%b %d, %Y').to_numpy(dtype=object)[birth_idx]
+    dob[rng.random(n_fighters) < .001] = '--'
+    height = np.array([f"{h // 12}' {h % 12}\"" for h in range(100)], dtype=object)[fighters['height']]
+    reach = np.array([f'{r}"' for r in range(120)], dtype=object)[fighters['reach']]
+    reach[rng.random(n_fighters) < .02] = '--'
+    stance = STANCES[fighters['stance']]
+
+    # --- EVENTS --- named after their main event, the first bout of the card
+    event_days, event_of_bout = np.unique(day, return_inverse=True)
+    event_date = (start_day + event_days).astype(str).astype(object)
+    is_main = np.concatenate([[True], day[1:] != day[:-1]])
+    main_bout = np.empty(len(event_days), dtype=np.int64)
+    main_bout[event_of_bout[is_main]] = np.flatnonzero(is_main)
+    surname = np.array([name.split(' ', 1)[1] for name in names.tolist()], dtype=object)
+    numbered = rng.random(len(event_days)) < .35
+    event_name = np.where(numbered, np.char.add('UFC ', (np.cumsum(numbered) + 20).astype(str)).astype(object), 'UFC Fight Night')
+    event_name = event_name + ': ' + surname[red[main_bout]] + ' vs. ' + surname[blue[main_bout]]
+    location = rng.choice(LOCATIONS, len(event_days), p=LOCATION_SHARES)
+    urls = [f'http://ufcstats.com/fight-details/{x:016x}' for x in rng.integers(0, 2**63, n).tolist()]
+
+    bonus_draw = rng.random(n)
+    columns = {
+        'title_fight': title.astype(np.int64),
+        'event_name': event_name[event_of_bout],
+        'event_date': event_date[event_of_bout],
+        'event_location': location[event_of_bout],
+        'fight_url': np.array(urls, dtype=object),
+        'weight_class': np.array(list(WEIGHT_CLASSES), dtype=object)[fighters['weight_class'][red]],
+        'method': method,
+        'round': fight_round,
+        'fight_time': clock(round_seconds),
+        'performance_bonus_winner': (finished & ~cnc & (bonus_draw < .3)).astype(np.int64),
+        'fight_otn_bonus': (rng.random(n) < .07).astype(np.int64),
+        'winner': winner,
+    }
+    for attr, values in [('fighter', names), ('record', record), ('dob', dob), ('height', height), ('reach', reach),
+                         ('stance', stance)]:
+        columns[f'{attr}_red'], columns[f'{attr}_blue'] = values[red], values[blue]
+    percents = {'sig_str_percent': 'sig_str', 'td_pct': 'td'}
+    for stat in ['kd', 'sig_str', 'sig_str_percent', 'td', 'td_pct', 'clinch', 'ground', 'sub_att', 'rev', 'ctrl',
+                 'head', 'body', 'leg', 'distance', 'total_strikes']:
+        for color in ['red', 'blue']:
+            if stat in percents:
+                values = percent(*stats[f'{percents[stat]}_{color}'])
+            elif stat == 'ctrl':
+                values = clock(stats[f'ctrl_{color}'])
+            elif isinstance(stats[f'{stat}_{color}'], tuple):
+                values = landed_of(*stats[f'{stat}_{color}'])
+            else:
+                values = stats[f'{stat}_{color}']
+            columns[f'{stat}_{color}'] = values
+    stats_df = pd.DataFrame(columns)
+
+    # --- ODDS --- same corners, some dates a day off and some names spelled the odds site's way
+    priced = np.sort(rng.choice(n, int(round(odds_coverage * n)), replace=False))
+    # odds history rows are sorted by red fighter then newest first
+    name_rank = np.empty(len(names), dtype=np.int64)
+    name_rank[np.argsort(names, kind='stable')] = np.arange(len(names))
+    priced = priced[np.lexsort((-day[priced], name_rank[red[priced]]))]
+    lines = market_odds(p_red[priced], rng)
+    odds_day = day[priced] + np.where(rng.random(len(priced)) < date_shift_rate, rng.choice([-1, 1], len(priced)), 0)
+    red_names, blue_names = names[red[priced]], names[blue[priced]]
+    spelled = odds_spelling(names)
+    variant = rng.random((2, len(priced))) < name_variant_rate
+    odds_df = pd.DataFrame({
+        'blue_fighter': np.where(variant[1], spelled[blue[priced]], blue_names),
+        'open_blue': lines['open_blue'], 'close1_blue': lines['close1_blue'], 'close2_blue': lines['close2_blue'],
+        'red_fighter': np.where(variant[0], spelled[red[priced]], red_names),
+        'open_red': lines['open_red'], 'close1_red': lines['close1_red'], 'close2_red': lines['close2_red'],
+        'event_date': (start_day + odds_day).astype(str).astype(object),
+        'og_blue_name': blue_names,
+        'og_red_fighter': red_names,
+    })
+
+    if not truth:
+        return stats_df, odds_df
+    truth_df = pd.DataFrame({'skill_red': red_skill, 'skill_blue': blue_skill, 'p_red': p_red})
+    return stats_df, odds_df, truth_df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Write a synthetic stats history and odds history')
+    parser.add_argument('--bouts', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--years', type=float, default=30)
+    parser.add_argument('--out-dir', default='.')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats_df, odds_df = synthetic_league(args.bouts, seed=args.seed, years=args.years)
+    print(f'{len(stats_df)} bouts, {len(odds_df)} odds rows in {time.perf_counter() - start:.1f}s')
+
+    # file names follow the scraper's {name}_{date}.csv, dated by the last event
+    last_date = stats_df['event_date'].iloc[0]
+    stats_df.to_csv(os.path.join(args.out_dir, f'stats_history_{last_date}.csv'))
+    odds_df.to_csv(os.path.join(args.out_dir, f'odds_history_{last_date}.csv'))
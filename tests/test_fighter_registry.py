@@ -0,0 +1,18 @@
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+
+from FeatureEngineering.fighter_registry import FighterRegistry
+
+def test_missing_names_get_no_id():
+    registry = FighterRegistry(['Jon Jones'])
+    bouts = pd.DataFrame({'fighter_red': ['Jon Jones', None], 'fighter_blue': ['Stipe Miocic', np.nan]})
+    red_ids, blue_ids, n_fighters = registry.fighter_ids(bouts)
+    np.testing.assert_array_equal(red_ids, [0, -1])
+    np.testing.assert_array_equal(blue_ids, [1, -1])
+    assert n_fighters == 2 and registry.names == ['Jon Jones', 'Stipe Miocic']
@@ -0,0 +1,68 @@
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pytest
+
+from FeatureEngineering import kernels
+from benchmarks.random_bouts import random_pairings
+
+BACKENDS = [pytest.param('numpy'),
+            pytest.param('numba', marks=pytest.mark.skipif(kernels.numba is None, reason='numba not installed'))]
+
+def bouts(n_bouts):
+    """Random pairings with draws/no contests (winner 2 and NaN), ordered event days and finish flags"""
+    red, blue, winner, n_fighters = random_pairings(n_bouts, seed=1)
+    winner = winner.astype(float)
+    winner[::7] = 2 # draws
+    winner[3::11] = np.nan # no contest without a result
+    rng = np.random.default_rng(2)
+    days = np.sort(rng.integers(0, max(n_bouts // 10, 1), n_bouts)).astype(float)
+    finish = (rng.random(n_bouts) < 0.5).astype(float)
+    return red, blue, winner, days, finish, max(n_fighters, 2)
+
+def run_elo(red, blue, winner, days, finish, n_fighters):
+    k = np.array([16.0, 32.0, 64.0])
+    ratings = np.full((n_fighters, len(k)), 1500.0)
+    out = kernels.elo_kernel(red, blue, winner, finish, k, np.array([0.0, 25.0, 50.0]), np.array([0.0, 0.5, 1.0]), ratings)
+    return out, ratings
+
+def run_glicko(red, blue, winner, days, finish, n_fighters):
+    state = [np.full(n_fighters, 1500.0), np.full(n_fighters, 350.0), np.zeros(n_fighters, dtype=bool), np.full(n_fighters, np.nan)]
+    return (kernels.glicko_kernel(red, blue, winner == 1, days, 90, 34, 350, *state, ~np.isnan(winner)), *state)
+
+def run_streaks(red, blue, winner, days, finish, n_fighters):
+    state = [np.zeros(n_fighters, dtype=np.int64) for _ in range(4)]
+    return (kernels.streak_kernel(red, blue, winner, *state), *state)
+
+KERNEL_RUNS = {'elo': run_elo, 'glicko': run_glicko, 'streaks': run_streaks}
+
+def run_with(backend, name, data):
+    kernels.set_backend(backend)
+    try:
+        return KERNEL_RUNS[name](*data)
+    finally:
+        kernels.set_backend(None)
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('name', list(KERNEL_RUNS))
+@pytest.mark.parametrize('n_bouts', [0, 1, 3000])
+def test_backend_matches_python_reference(backend, name, n_bouts):
+    data = bouts(n_bouts)
+    reference = run_with('python', name, data)
+    result = run_with(backend, name, data)
+    for got, expected in zip(result, reference):
+        np.testing.assert_allclose(got, expected, rtol=0, atol=1e-9)
+
+def test_draws_leave_elo_unchanged_and_end_streaks():
+    red, blue = np.array([0, 0, 0]), np.array([1, 1, 1])
+    winner = np.array([1.0, 2.0, np.nan])
+    for backend in ['python', 'numpy'] + (['numba'] if kernels.numba is not None else []):
+        data = (red, blue, winner, np.arange(3.0), np.zeros(3), 2)
+        elo, _ = run_with(backend, 'elo', data)
+        np.testing.assert_array_equal(elo[1], elo[2])
+        streaks = run_with(backend, 'streaks', data)[0]
+        assert streaks[1, 0] == 1 and streaks[2, 0] == 0 # red's win streak ends with the draw
@@ -0,0 +1,23 @@
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from FeatureEngineering.name_resolver import NameResolver
+
+KNOWN = ['Alexander Volkanovski', 'Alex Pereira', 'Alexandre Pantoja', 'Jon Jones', 'Jonathan Martinez']
+
+def partial_names(query):
+    resolver = NameResolver(KNOWN)
+    return [resolver.names[row] for row in resolver.partial_matches(query)]
+
+def test_shortened_first_name_matches_both_ways():
+    assert partial_names('Alex Volkanovski') == ['Alexander Volkanovski']
+    assert NameResolver(['Alex Volkanovski']).partial_matches('Alexander Volkanovski') == [0]
+
+def test_partial_matches_keep_whole_names():
+    assert partial_names('Volkanovski') == ['Alexander Volkanovski']
+    assert partial_names('Jon Jones') == ['Jon Jones']
+    assert partial_names('Alex') == ['Alexander Volkanovski', 'Alex Pereira', 'Alexandre Pantoja']
+    assert partial_names('Jo Martinez') == [] # too short to count as a prefix
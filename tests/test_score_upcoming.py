@@ -0,0 +1,61 @@
+import sys
+import os
+import glob
+
+# Add the project root to the Python path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+import numpy as np
+import pandas as pd
+
+from ufc_pipeline.features_pipeline import FeatureEngineering
+
+def latest_csv(prefix):
+    return sorted(glob.glob(os.path.join(ROOT, 'data', f'{prefix}_*.csv')))[-1]
+
+def test_score_upcoming_twice_gives_same_features(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # standardized_merge writes a debug csv to the working directory
+    stats = pd.read_csv(latest_csv('stats_history')).head(600) # most recent events, scraped newest first
+    odds = pd.read_csv(latest_csv('odds_history'))
+    upcoming_stats = pd.read_csv(latest_csv('upcoming_stats'))
+    upcoming_odds = pd.read_csv(latest_csv('upcoming_odds'))
+    raw_upcoming = upcoming_stats.copy()
+
+    fe = FeatureEngineering()
+    _, state = fe.build_state(stats, odds)
+    first = fe.score_upcoming(state, upcoming_stats, upcoming_odds)
+    second = fe.score_upcoming(state, upcoming_stats, upcoming_odds)
+
+    pd.testing.assert_frame_equal(first, second)
+    pd.testing.assert_frame_equal(upcoming_stats, raw_upcoming)
+    assert first[['height_red', 'height_blue']].notna().all().all()
+
+def test_upcoming_bouts_keep_a_nan_winner(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    stats = pd.read_csv(latest_csv('stats_history')).head(600)
+    odds = pd.read_csv(latest_csv('odds_history'))
+    upcoming_stats = pd.read_csv(latest_csv('upcoming_stats'))
+    upcoming_odds = pd.read_csv(latest_csv('upcoming_odds'))
+
+    history, upcoming = FeatureEngineering().build_all_stats(stats, upcoming_stats, odds, upcoming_odds)
+    assert upcoming['winner'].isna().all()
+    assert history['winner'].isin([0, 1, 2]).all()
+
+def test_snapshots_match_the_full_history_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    stats = pd.read_csv(latest_csv('stats_history'))
+    stats = stats[stats['event_date'].between('2022-03-01', '2022-05-31')] # 2022-04-16 has two odds lines for one bout
+    odds = pd.read_csv(latest_csv('odds_history'))
+
+    fe = FeatureEngineering()
+    history, state = fe.build_state(stats, odds)
+    snapshot_history, snapshot_state, _ = fe.build_snapshots(stats, odds)
+
+    pd.testing.assert_frame_equal(snapshot_history, history)
+    assert sorted(snapshot_state.names) == sorted(state.names)
+    same_fighters = [state.ids[name] for name in snapshot_state.names] # ids follow the order fighters were first seen
+    for engine, arrays in state.engines.items():
+        for key, values in arrays.items():
+            if values.dtype != object and key != 'last_opponent': # sets and opponent ids hold ids themselves
+                np.testing.assert_array_equal(snapshot_state.engines[engine][key], values[same_fighters], err_msg=f'{engine} {key}')
@@ -8,6 +8,8 @@ from datetime import datetime
 # Add the project root to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) 
 from features_pipeline import FeatureEngineering
+from FeatureEngineering.fighter_state import FighterState
+from FeatureEngineering.fighter_registry import FighterRegistry
 # from scraping_pipeline import UFC_Webscraper
 
 get_all_stats = False
@@ -17,6 +19,10 @@ get_next_fight_stats_odds = False
 get_missing_stats = False
 generate_model_df = True 
 
+build_fighter_state = False # save the end of history state of every feature engine
+update_from_state = False # apply only the new bouts to the saved state and score the upcoming card from it
+use_fighter_registry = False # fighter ids (and odds name aliases) from the saved registry, built from the history on the first run
+
 fp = r'/Users/jmarc/ BU/Github_Repos/sports_betting/data/stats_history_2025-11-05.csv'
 pd.read_csv(fp)
 
@@ -31,6 +37,8 @@ odds_history_file_string  = r'/Users/jmarc/ BU/Github_Repos/sports_betting/data/
 
 upcoming_stats_file_string  = r'/Users/jmarc/ BU/Github_Repos/sports_betting/data/upcoming_stats'
 upcoming_odds_file_string = r'/Users/jmarc/ BU/Github_Repos/sports_betting/data/upcoming_odds'
+fighter_state_path = r'/Users/jmarc/ BU/Github_Repos/sports_betting/data/fighter_state.pkl'
+fighter_registry_path = r'/Users/jmarc/ BU/Github_Repos/sports_betting/data/fighter_registry.csv'
 
 
 # find the most recent stats and odds history by most recent date 
@@ -45,7 +53,13 @@ next_fight_date = r'2025-11-08'
 
 if __name__ == "__main__":
     # scraper = UFC_Webscraper()
-    features = FeatureEngineering()
+    registry = None
+    if use_fighter_registry is True:
+        if os.path.exists(fighter_registry_path):
+            registry = FighterRegistry.load(fighter_registry_path)
+        else:
+            registry = FighterRegistry.from_history(stats_history, odds_history)
+    features = FeatureEngineering(registry=registry)
 
     # scrape all stats
     if get_all_stats is True: 
@@ -105,3 +119,25 @@ if __name__ == "__main__":
         odds_stats_df.to_csv(fr'C:\Users\jcmar\my_files\SportsBetting\data\entire_odds_stats_{date_today}.csv', index=False)
         upcoming_df.to_csv(fr'C:\Users\jcmar\my_files\SportsBetting\data\upcoming_odds_stats_{next_fight_date}.csv', index=False)
 
+    # full history once, keeps the engine state so later cards only replay new bouts
+    if build_fighter_state is True:
+        odds_stats_df, state = features.build_state(stats_history, odds_history)
+        state.save(fighter_state_path)
+
+    # new completed bouts (from get_missing_stats) onto the saved state, then the upcoming card from the state
+    if update_from_state is True:
+        state = FighterState.load(fighter_state_path)
+        if get_missing_stats:
+            new_stats = missing_stats[pd.to_datetime(missing_stats['event_date']) > state.last_date]
+            new_odds = missing_odds[pd.to_datetime(missing_odds['event_date']) > state.last_date]
+            features.update_state(state, new_stats, new_odds)
+            state.save(fighter_state_path)
+
+        next_fight_stats = pd.read_csv(f'{upcoming_stats_file_string}_{next_fight_date}.csv')
+        next_odds_df = pd.read_csv(f'{upcoming_odds_file_string}_{next_fight_date}.csv')
+        upcoming_df = features.score_upcoming(state, next_fight_stats, next_odds_df)
+        upcoming_df.to_csv(fr'C:\Users\jcmar\my_files\SportsBetting\data\upcoming_odds_stats_{next_fight_date}.csv', index=False)
+
+    # fighters first seen in this run keep their ids next time
+    if registry is not None:
+        registry.save(fighter_registry_path)
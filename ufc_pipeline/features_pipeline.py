@@ -8,19 +8,53 @@ import numpy as np
 import pandas as pd 
 from FeatureEngineering.ufc_features import single_event_features, apply_rolling_stats, non_rolling_stats, upcoming_event_features
 from FeatureEngineering.odds_features import build_odds_features
-from FeatureEngineering.feature_functions import count_fav_dog
+from FeatureEngineering.feature_functions import count_fav_dog, odds_counters
+from FeatureEngineering.appearances import FighterAppearances
+from FeatureEngineering.fighter_state import FighterState, StateSnapshots
+from FeatureEngineering.memory import compact_frame, peak_rss_mb
+from FeatureEngineering.name_resolver import NameResolver, normalize_names
 
 class FeatureEngineering: 
-    """Requires df with all stats and odds merged, computes ai model features"""
-
-    def __init__(self):
-        pass
+    """Requires df with all stats and odds merged, computes ai model features
+    windows: last N fight window sizes, half_lives: decay half lives in days, for the windowed rolling stats
+    features: non rolling feature blocks (or columns) to compute, see FEATURE_BLOCKS, None for all of them
+    cache_dir: directory for the per feature block disk cache, None to always recompute
+    n_jobs: worker processes for the independent feature blocks, 1 runs everything in this process
+    partition: split the bouts into independent fighter components across the n_jobs workers instead
+    lean: float32 features and categorical strings between the build stages, build_all_stats then prints the peak RSS
+    resolve_names: odds names without an exact match in stats are fuzzy matched to the closest stats name
+    scoring at least resolve_names (0-1, e.g. 0.6), None keeps exact matching only
+    registry: persisted FighterRegistry, fighter ids of every engine come from it (new fighters are added to it)
+    and stats/odds names it knows as aliases are replaced by the canonical spelling before anything is computed
+    odds_lines: betting lines (open, close1, close2) to add the odds_counters career counters for, () for none"""
+
+    def __init__(self, windows=(), half_lives=(), features=None, cache_dir=None, n_jobs=1, partition=False, lean=False,
+                 resolve_names=None, registry=None, odds_lines=()):
+        self.windows = windows
+        self.half_lives = half_lives
+        self.features = features
+        self.cache_dir = cache_dir
+        self.n_jobs = n_jobs
+        self.partition = partition
+        self.lean = lean
+        self.resolve_names = resolve_names
+        self.registry = registry
+        self.odds_lines = odds_lines
+        self.peak_rss = None
+
+    def canonical_names(self, df, cols=('fighter_red', 'fighter_blue')):
+        """df with the registry's canonical spelling in the fighter name columns, df itself without a registry"""
+        if self.registry is None:
+            return df
+        return df.assign(**{col: self.registry.canonical(df[col]) for col in cols})
 
     def standardize_features(self, df):
-        single_features = single_event_features(df)
+        single_features = single_event_features(self.canonical_names(df))
          #rolling features currently relies on these column names 
-        rolling_features = apply_rolling_stats(single_features)
-        all_features = non_rolling_stats(rolling_features)
+        rolling_features = apply_rolling_stats(single_features, self.windows, self.half_lives, registry=self.registry)
+        appearances = FighterAppearances(rolling_features, registry=self.registry) # long format fighter table, shared by the non rolling features
+        all_features = non_rolling_stats(rolling_features, appearances, features=self.features, cache_dir=self.cache_dir,
+                                         n_jobs=self.n_jobs, partition=self.partition)
         return all_features
     
     def build_all_stats(self, stats_df, upcoming_stats, odds_df, upcoming_odds):
@@ -28,91 +62,212 @@ class FeatureEngineering:
         total_odds = pd.concat([odds_df, upcoming_odds]).reset_index(drop=True) # combine upcoming odds and odds history
         total_odds = build_odds_features(total_odds)
 
-        past_event_stats = single_event_features(stats_df.copy())
+        past_event_stats = single_event_features(self.canonical_names(stats_df))
         # past_event_stats.to_csv(r'C:\Users\jcmar\my_files\SportsBetting\data\ufc_singe_event_features.csv', index=False)
         past_event_stats = past_event_stats.loc[:, ~past_event_stats.columns.str.contains('^Unnamed')]
 
-        upcoming_single_event = upcoming_event_features(upcoming_stats)
-        
-        # Create empty rows/columns for pre fight stats 
-        exclude_cols = ['fighter_red', 'fighter_blue']
-        stats_cols = [col for col in past_event_stats.columns if col not in exclude_cols]
-        upcoming_features_NA = pd.DataFrame(index=range(upcoming_single_event.shape[0]), columns=stats_cols) 
-        empty_df = pd.concat([upcoming_single_event[exclude_cols], upcoming_features_NA], axis=1) # Combine fighter names with NaN stats
-        empty_df.columns = past_event_stats.columns # Assumes same order and length
-
-        # Overwrite the scraped columns with actual values
-        scraped_columns = [
-            'fighter_red', 'fighter_blue', 'weight_class', 'event_date',
-            'reach_red', 'reach_blue', 'height_red', 'height_blue',
-            'red_age', 'blue_age', 'event_location'
-        ]
-
-        for col in scraped_columns:
-            if col in empty_df.columns and col in upcoming_single_event.columns:
-                empty_df[col] = upcoming_single_event[col]
-
-        empty_df['event_date'] = pd.to_datetime(empty_df['event_date']) # Make sure event_date is datetime
+        upcoming_single_event = upcoming_event_features(self.canonical_names(upcoming_stats))
+        empty_df = self.upcoming_placeholders(upcoming_single_event, past_event_stats.columns)
         combined_df = pd.concat([empty_df, past_event_stats], axis=0).reset_index(drop=True) # Combine with past event stats
+        del past_event_stats
+        total_odds = self.compact(total_odds, categories=False)
+        combined_df = self.compact(combined_df, categories=False)
 
         rolling_fp = r'C:\Users\jcmar\my_files\SportsBetting\data\ufc_new_rolling.csv'
-        rolling_df = apply_rolling_stats(combined_df) #sort here
-        rolling_df = rolling_df.copy() 
+        rolling_df = apply_rolling_stats(combined_df, self.windows, self.half_lives, registry=self.registry) #sort here
+        del combined_df
+        rolling_df = self.compact(rolling_df, categories=False)
         rolling_df.to_csv(rolling_fp, index=False)
 
-        total_df = non_rolling_stats(rolling_df)
+        appearances = FighterAppearances(rolling_df, registry=self.registry) # long format fighter table, shared by the non rolling features
+        total_df = non_rolling_stats(rolling_df, appearances, features=self.features, cache_dir=self.cache_dir,
+                                     n_jobs=self.n_jobs, partition=self.partition)
+        del rolling_df, appearances
+        total_df = self.compact(total_df, categories=False)
         total_df.to_csv(r'C:\Users\jcmar\my_files\SportsBetting\data\new_combined.csv', index=False)
-        total_df = total_df.copy()
 
-        merged_df = self.standardized_merge(total_df, total_odds)
-        merged_df = merged_df.sort_values(by='date', ascending=True).reset_index(drop=True)
-        merged_df = merged_df.copy()
-
-        # counts of fav and dog 
-        merged_df[['fav_counts_red', 'dog_counts_red', 'fav_counts_blue', 'dog_counts_blue']] = count_fav_dog(merged_df)
+        merged_df = self.odds_history_features(total_df, total_odds)
+        del total_df
+        merged_df = self.compact(merged_df, categories=True)
 
         odds_stats_history = merged_df.iloc[:-upcoming_stats.shape[0], :]
         # odds_stats_history.to_csv(full_file_path)
         upcoming_df = merged_df.iloc[-upcoming_stats.shape[0]:, :]
         # upcoming_df.to_csv(upcoming_file_path)
-        
+
+        self.peak_rss = peak_rss_mb()
+        if self.lean:
+            print(f'build_all_stats peak RSS: {self.peak_rss:.0f} MB')
         return odds_stats_history, upcoming_df
 
-    def standardize_dates(self, stats, odds):
-        # dates in odds_df/stats_df are +- 1 day apart, need these to be equal 
+    def compact(self, df, categories):
+        """float32 (and categorical) dtypes in lean mode, unchanged otherwise"""
+        return compact_frame(df, categories) if self.lean else df
 
-        # iterate through stats_df rows, get target date fropm stats
-        for i, row in stats.iterrows():
+    def upcoming_placeholders(self, upcoming_single_event, stats_columns):
+        """Rows for upcoming bouts laid out like the single event features, NaN stats with the scraped columns filled in"""
 
-            #find all matchups between red and blue fighter in odds
-            mask = (odds['red_clean'] == row['red_clean']) & (odds['blue_clean'] == row['blue_clean']) 
+        # Create empty rows/columns for pre fight stats 
+        exclude_cols = ['fighter_red', 'fighter_blue']
+        stats_cols = [col for col in stats_columns if col not in exclude_cols]
+        upcoming_features_NA = pd.DataFrame(index=range(upcoming_single_event.shape[0]), columns=stats_cols) 
+        empty_df = pd.concat([upcoming_single_event[exclude_cols].reset_index(drop=True), upcoming_features_NA], axis=1) # Combine fighter names with NaN stats
+        empty_df.columns = stats_columns # Assumes same order and length
+
+        # Overwrite the scraped columns with actual values
+        scraped_columns = [
+            'fighter_red', 'fighter_blue', 'weight_class', 'event_date',
+            'reach_red', 'reach_blue', 'height_red', 'height_blue',
+            'red_age', 'blue_age', 'event_location'
+        ]
 
-            # if odds contains the stats matchup 
-            if mask.any():
-                for i in odds[mask].index:
+        for col in scraped_columns:
+            if col in empty_df.columns and col in upcoming_single_event.columns:
+                empty_df[col] = upcoming_single_event[col].to_numpy()
 
-                    # iterate and find dates of each red/blue matchup 
-                    target_date = odds.at[i, 'date']
+        empty_df['event_date'] = pd.to_datetime(empty_df['event_date']) # Make sure event_date is datetime
+        return empty_df
+
+    def odds_history_features(self, total_df, odds, state=None):
+        """Merge the stats features with the odds features and add the fav/dog counts (and odds counters), date sorted"""
+        merged_df = self.standardized_merge(total_df, odds)
+        merged_df = merged_df.sort_values(by='date', ascending=True, kind='stable').reset_index(drop=True)
+
+        # counts of fav and dog, joined on rather than set as a column list since the merge leaves duplicate red_fighter/blue_fighter columns
+        appearances = FighterAppearances(merged_df, registry=self.registry) if self.registry is not None and state is None else None
+        fav_dog = count_fav_dog(merged_df, appearances, state, state_name='odds_history')
+        fav_dog = pd.DataFrame(fav_dog, columns=['fav_counts_red', 'dog_counts_red', 'fav_counts_blue', 'dog_counts_blue'], index=merged_df.index)
+        counters = pd.DataFrame(odds_counters(merged_df, self.odds_lines, appearances, state), index=merged_df.index)
+        return pd.concat([merged_df, fav_dog, counters], axis=1)
+
+    def state_features(self, state, single_features, odds):
+        """Pre fight features of single event features that all come after the bouts already in state, advances state"""
+        single_features = single_features.loc[:, ~single_features.columns.str.contains('^Unnamed')]
+        rolling_df = apply_rolling_stats(single_features, self.windows, self.half_lives, state)
+        total_df = non_rolling_stats(rolling_df, state=state, features=self.features)
+        return self.odds_history_features(total_df, odds, state)
+
+    def build_state(self, stats_df, odds_df):
+        """
+        Full history run that also returns the FighterState at the end of it, save it with state.save(path).
+        Later cards only need update_state with the newly completed bouts and score_upcoming for the next card.
+        """
+        state = FighterState(self.registry)
+        past_event_stats = single_event_features(self.canonical_names(stats_df))
+        history = self.state_features(state, past_event_stats, build_odds_features(odds_df))
+        state.last_date = past_event_stats['date'].max()
+        state.stats_columns = past_event_stats.loc[:, ~past_event_stats.columns.str.contains('^Unnamed')].columns
+        return history, state
+
+    def build_snapshots(self, stats_df, odds_df):
+        """
+        Full history run one event date at a time with a checkpoint after each date, returns (history, state, snapshots).
+        snapshots.as_of(date) is the state to start update_state/score_upcoming from at any point in history.
+        """
+        state = FighterState(self.registry)
+        snapshots = StateSnapshots()
+        past_event_stats = single_event_features(self.canonical_names(stats_df))
+        past_event_stats = past_event_stats.loc[:, ~past_event_stats.columns.str.contains('^Unnamed')]
+        state.stats_columns = past_event_stats.columns
+
+        total_odds = build_odds_features(odds_df)
+        odds_dates = pd.to_datetime(total_odds['event_date'])
+        history = []
+        for date, bouts in past_event_stats.groupby('date', sort=True):
+            near = (odds_dates - date).abs() <= pd.Timedelta(days=1) # odds dates are +- 1 day of the stats dates
+            history.append(self.state_features(state, bouts, total_odds[near]))
+            state.last_date = date
+            snapshots.checkpoint(state, date, pd.concat([bouts['fighter_red'], bouts['fighter_blue']]))
+        return pd.concat(history, ignore_index=True), state, snapshots
+
+    def update_state(self, state, new_stats, new_odds):
+        """Apply only newly completed bouts (all after state.last_date) to state in place, returns their features"""
+        new_event_stats = single_event_features(self.canonical_names(new_stats))
+        if state.last_date is not None and (new_event_stats['date'] <= state.last_date).any():
+            raise ValueError(f"new bouts must come after the last bout in the state ({state.last_date})")
+
+        new_history = self.state_features(state, new_event_stats, build_odds_features(new_odds))
+        state.last_date = new_event_stats['date'].max()
+        return new_history
+
+    def score_upcoming(self, state, upcoming_stats, upcoming_odds):
+        """Features of an upcoming card from the end of history state, same rows as build_all_stats upcoming_df.
+        Works on copies of the state and of upcoming_stats, so the same card can be scored again"""
+        upcoming_single_event = upcoming_event_features(self.canonical_names(upcoming_stats))
+        empty_df = self.upcoming_placeholders(upcoming_single_event, state.stats_columns)
+        return self.state_features(state.copy(), empty_df, build_odds_features(upcoming_odds))
 
-                    # check if current stats date matches with +- odds date 
-                    if (row['date'] - pd.Timedelta(days=1) == target_date) or (row['date'] + pd.Timedelta(days=1) == target_date):
-                        # if found, replace odds_date with stats date for standardization 
-                        odds.at[i, 'date'] = row['date'] # set the date in odds to the date in stats 
-        return odds 
+    def standardize_dates(self, stats, odds):
+        """
+        Dates in odds_df/stats_df are +- 1 day apart, set each odds date to the stats date of the same matchup.
+        Keyed join instead of a mask over all odds per stats row: the stats rows are sorted by (red_clean, blue_clean)
+        matchup so every odds row finds its matchup's stats rows with a binary search. Each odds row then goes
+        through those stats rows in stats order and takes the date of any that is one day off its current date,
+        one vectorized round per k-th stats row of a matchup, so the rounds are as many as the most bouts of a matchup.
+        """
+        # matchup ids shared by both frames, a missing name never matches
+        n_stats = stats.shape[0]
+        red, _ = pd.factorize(pd.concat([stats['red_clean'], odds['red_clean']], ignore_index=True))
+        blue, blue_names = pd.factorize(pd.concat([stats['blue_clean'], odds['blue_clean']], ignore_index=True))
+        matchup = np.where((red >= 0) & (blue >= 0), red.astype(np.int64) * (len(blue_names) + 1) + blue, -1)
+        stats_matchup, odds_matchup = matchup[:n_stats], matchup[n_stats:]
+
+        stats_order = np.argsort(stats_matchup, kind='stable') # stats order kept within a matchup
+        sorted_matchup = stats_matchup[stats_order]
+        sorted_dates = stats['date'].to_numpy()[stats_order]
+        first = np.searchsorted(sorted_matchup, odds_matchup, side='left')
+        n_matches = np.where(odds_matchup >= 0, np.searchsorted(sorted_matchup, odds_matchup, side='right') - first, 0)
+
+        dates = odds['date'].to_numpy().copy()
+        one_day = np.timedelta64(1, 'D')
+        for k in range(n_matches.max(initial=0)):
+            rows = np.flatnonzero(n_matches > k)
+            stats_dates = sorted_dates[first[rows] + k]
+            off_by_one = np.abs(stats_dates - dates[rows]) == one_day
+            dates[rows[off_by_one]] = stats_dates[off_by_one] # set the date in odds to the date in stats
+
+        odds['date'] = pd.Series(dates, index=odds.index, dtype=odds['date'].dtype)
+        return odds
 
     def clean_col(self, col):
-        col = col.str.lower() \
-            .str.replace('-', ' ', regex=False) \
-            .str.replace('.', '', regex=False) \
-            .str.replace("'", '', regex=False) \
-            .str.replace(r'\bsaint\b', 'st', case=False, regex=True) # add space here for fixxing other fighter names 
-        return col 
+        return normalize_names(col) # every distinct name cleaned once instead of five passes over every row
+
+    def respell_odds_names(self, stats, odds):
+        """
+        Odds name spellings (red_clean/blue_clean) put onto the stats spellings before the merge.
+        Names the registry knows as aliases take the canonical spelling. With resolve_names, names still matching
+        no stats name are replaced by the closest stats name scoring at least self.resolve_names,
+        e.g. 'alex volkanovski' -> 'alexander volkanovski', 'wang anying' -> 'anying wang'.
+        One inverted index over the stats names, every distinct odds name looked up once.
+        """
+        cols = ['red_clean', 'blue_clean']
+        before = odds[cols].copy()
+        if self.registry is not None:
+            odds['red_clean'] = self.clean_col(self.registry.canonical(odds['red_fighter']))
+            odds['blue_clean'] = self.clean_col(self.registry.canonical(odds['blue_fighter']))
+
+        if self.resolve_names is not None:
+            stats_names = pd.concat([stats['red_clean'], stats['blue_clean']]).dropna().unique()
+            resolver = NameResolver(stats_names)
+            known = set(stats_names)
+            for col in cols:
+                unmatched = odds[col].notna() & ~odds[col].isin(known)
+                ids, _ = resolver.resolve_many(odds.loc[unmatched, col], self.resolve_names)
+                resolved = np.flatnonzero(ids >= 0)
+                odds.loc[odds.index[unmatched][resolved], col] = stats_names[ids[resolved]]
+
+        # a bout scraped under both spellings keeps the odds row that matched as scraped
+        changed = (odds[cols].ne(before) & odds[cols].notna()).any(axis=1).to_numpy()
+        keys = odds[cols + ['event_date']].assign(changed=changed)
+        keys = keys.sort_values('changed', kind='stable')
+        duplicate = keys.drop(columns='changed').duplicated().reindex(odds.index).to_numpy()
+        return odds[~(duplicate & changed)]
 
     def standardized_merge(self, stats_df, odds_df):
         odds_df = odds_df.loc[:, ~odds_df.columns.str.contains('^Unnamed')] # filter out columns that contain 'Unamed'
 
-        stats = stats_df.reset_index(drop=True).copy()
-        odds = odds_df.reset_index(drop=True).copy()
+        stats = stats_df.reset_index(drop=True) # new frames, the added columns do not touch stats_df/odds_df
+        odds = odds_df.reset_index(drop=True)
 
         odds['date'] = pd.to_datetime(odds['event_date'])
         stats['date'] = pd.to_datetime(stats['date'])
@@ -133,7 +288,10 @@ class FeatureEngineering:
         odds['red_fighter_odds'] = odds['red_fighter']
         odds['blue_fighter_odds'] = odds['blue_fighter']
 
-        odds = self.standardize_dates(stats, odds)
+        if self.registry is not None or self.resolve_names is not None:
+            odds = self.respell_odds_names(stats, odds)
+
+        odds = self.standardize_dates(stats[['red_clean', 'blue_clean', 'date']], odds) # only the match columns, not a 300+ column row per bout
         odds.to_csv(r'C:\Users\jcmar\my_files\SportsBetting\data\look_at_odds.csv')
 
         # merge on fighter names and date 
@@ -146,7 +304,7 @@ class FeatureEngineering:
         #                             'og_red_fighter', 'og_blue_name']) # remove cols with _x or _y, these are the uncleaned columns that merged over 
         
         new_df = new_df.drop_duplicates().reset_index(drop=True) # duplicat rows because of undstandardized fighter name columns 
-        return new_df.copy()
+        return new_df
 
 
 
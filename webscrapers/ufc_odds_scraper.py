@@ -1,3 +1,9 @@
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 
@@ -14,6 +20,8 @@ import random
 import time
 import undetected_chromedriver as uc
 
+from FeatureEngineering.name_resolver import NameResolver
+
 def fighter_odds_search(red_fighter, blue_fighters, event_dates, driver):
 
     search_name = red_fighter
@@ -32,16 +40,11 @@ def fighter_odds_search(red_fighter, blue_fighters, event_dates, driver):
         return odds_dic
 
     rows = table.find_elements(By.TAG_NAME, "tr")
-    possible_matches = []
-
-    for row in rows:
-        fighter_link = row.find_element(By.CSS_SELECTOR, "td a")
-        fighter_name = fighter_link.text.lower()
+    fighter_links = [row.find_element(By.CSS_SELECTOR, "td a") for row in rows]
 
-        # Check if all parts of the search name are in the fighter's name
-        if all(term in clean_string(fighter_name) for term in clean_string(search_name)) or \
-            all(term in clean_string(search_name) for term in clean_string(fighter_name)):
-            possible_matches.append(fighter_link)
+    # results whose name holds every word of the search name or the other way around, alex matches alexander
+    resolver = NameResolver([link.text for link in fighter_links])
+    possible_matches = [fighter_links[i] for i in resolver.partial_matches(search_name)]
 
     if possible_matches:
         print(f"Found possible matches: {[link.text for link in possible_matches]}")
@@ -66,6 +69,7 @@ def fighter_odds_search(red_fighter, blue_fighters, event_dates, driver):
 def scrape_odds(driver, blue_fighters, dates):
 
     red_fighter_row = driver.find_elements(By.CSS_SELECTOR, "tr.main-row") #red fighter row 
+    blue_resolver = NameResolver(blue_fighters) # indexed once for every row of the page
     odds_dic = {'blue_fighter':[], 'open_blue':[], 'close1_blue':[], 'close2_blue':[],
             'red_fighter':[], 'open_red':[], 'close1_red':[], 'close2_red':[], 'event_date':[],
             'og_blue_name':[]}
@@ -76,7 +80,7 @@ def scrape_odds(driver, blue_fighters, dates):
         blue_row = red_fighter_row[i].find_element(By.XPATH, "following-sibling::tr[1]")
         blue_name = blue_row.find_element(By.CSS_SELECTOR, "th.oppcell a").text
         # blue_name = clean_string_simple(blue_name)
-        match, og_blue_name = is_two_way_partial_match(blue_name, blue_fighters)
+        match, og_blue_name = is_two_way_partial_match(blue_name, blue_resolver)
         try:
             event_date_elements = blue_row.find_elements(By.CSS_SELECTOR, "td.item-non-mobile")
             current_event_date = event_date_elements[0].text.strip()
@@ -116,18 +120,13 @@ def scrape_odds(driver, blue_fighters, dates):
 
     return odds_dic
 
-def clean_string(s):
-    return s.lower().replace(" ", " ").replace("-", " ").replace(".", "").replace("'","")
-
 def is_two_way_partial_match(scraped_name, search_names):
-    
-    scraped_parts = clean_string(scraped_name)
-    
-    for name in search_names:
-        search_parts = clean_string(name)
-        if all(part in scraped_parts for part in search_parts) or \
-           all(part in search_parts for part in scraped_parts):
-            return 'True', name  # Match found
+    """First search name whose words are all in scraped_name or that has every word of scraped_name, a word
+    also matches a longer word it starts (alex / alexander). search_names: list of names or a NameResolver built over them"""
+    resolver = search_names if isinstance(search_names, NameResolver) else NameResolver(search_names)
+    matches = resolver.partial_matches(scraped_name)
+    if matches:
+        return 'True', resolver.names[matches[0]]  # Match found
     return 'False', 'None'  # No match found
 
 def get_fighter_odds(fighter_df):